@@ -1,20 +1,28 @@
 from django.contrib import admin
-from .models import Employee, Shift, Schedule, SchedulingResult, EmployeeRole
-from .forms import EmployeeForm, EmployeeRoleFormSet
+from .models import Employee, Shift, Schedule, SchedulingResult, SchedulingJob, SchedulingLock, EmployeeRole, EmployeeWeekHours, AvailabilityException
+from .forms import EmployeeForm, EmployeeRoleFormSet, AvailabilityExceptionForm
 
 class EmployeeRoleInline(admin.TabularInline):
     model = EmployeeRole
     formset = EmployeeRoleFormSet
     extra = 1
 
+class AvailabilityExceptionInline(admin.TabularInline):
+    model = AvailabilityException
+    form = AvailabilityExceptionForm
+    extra = 0
+
 @admin.register(Employee)
 class EmployeeAdmin(admin.ModelAdmin):
     form = EmployeeForm
-    inlines = [EmployeeRoleInline]
+    inlines = [EmployeeRoleInline, AvailabilityExceptionInline]
     list_display = ('name', 'employee_type', 'max_hours_per_week', 'satisfaction_score')
     list_filter = ('roles__role',)
     search_fields = ('name', 'user__username')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('roles')
+
     def employee_type(self, obj):
         return obj.employee_type
 
@@ -34,5 +42,21 @@ class ScheduleAdmin(admin.ModelAdmin):
 
 @admin.register(SchedulingResult)
 class SchedulingResultAdmin(admin.ModelAdmin):
-    list_display = ('created_at', 'total_satisfaction', 'unassigned_shifts')
-    list_filter = ('created_at',)
+    list_display = ('created_at', 'total_satisfaction', 'unassigned_shifts', 'feasible_pairs', 'objective', 'seconds', 'query_count', 'solver_backend', 'lock_wait', 'lock_hold')
+    list_filter = ('created_at', 'solver_backend')
+
+@admin.register(SchedulingJob)
+class SchedulingJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'phase', 'progress', 'requested_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+
+@admin.register(SchedulingLock)
+class SchedulingLockAdmin(admin.ModelAdmin):
+    list_display = ('key', 'owner', 'expires_at')
+
+@admin.register(EmployeeWeekHours)
+class EmployeeWeekHoursAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'week', 'hours')
+    list_filter = ('week',)
+    search_fields = ('employee__name',)
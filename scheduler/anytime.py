@@ -0,0 +1,211 @@
+import random
+import time
+
+import numpy as np
+
+from .costs import MIN_REST_MINUTES, REST_GAP_PENALTY, WEEKLY_HOURS_PENALTY
+from .greedy import solve_greedy
+
+DEFAULT_TIME_BUDGET = 10.0
+
+# Charge for every staffing slot left open, above the cost of any assignment, so
+# that no move trades staffing for a cheaper schedule
+OPEN_SLOT_COST = 1000
+
+# Stop early after this many moves in a row without improvement
+MAX_STALE_MOVES = 20000
+
+# Least seconds between two progress reports
+REPORT_INTERVAL = 0.5
+
+
+class LocalSearch:
+    """
+    A complete schedule over a CostModel that local moves try to improve.
+
+    Moves are taken when they lower the sum of the assignments' costs as computed
+    by CostModel.assignment_costs() plus OPEN_SLOT_COST for every open slot. `cost`,
+    reported as the objective, is that sum without the open slots, which are
+    reported on their own. Moves keep the hard rules of the other backends: an
+    employee never works overlapping shifts or more than max_hours_per_week.
+    `timeline` holds the shifts worked before the run; the run's own assignments
+    are kept as a set of shift columns per employee, so a move only re-costs the
+    one or two employees it touches.
+    """
+
+    def __init__(self, model, required, assignments, timeline):
+        n_rows, n_cols = model.shape
+        self.n_cols = n_cols
+        self.timeline = timeline
+        self.edge_cost = dict(zip((model.edge_row * n_cols + model.edge_col).tolist(), model.base_costs().tolist()))
+        self.col_rows = [[] for _ in range(n_cols)]
+        for row, col in zip(model.edge_row.tolist(), model.edge_col.tolist()):
+            self.col_rows[col].append(row)
+        self.start = model.shift_start.tolist()
+        self.end = model.shift_end.tolist()
+        self.day = model.shift_day.tolist()
+        self.week = model.shift_week.tolist()
+        self.max_minutes = model.max_minutes.tolist()
+        self.last_end = timeline.last_end.tolist()
+        self.week_minutes = timeline.week_minutes.tolist()
+
+        self.open_slots = [int(slots) for slots in required]
+        self.row_cols = [set() for _ in range(n_rows)]
+        self.col_staff = [set() for _ in range(n_cols)]
+        self.assignments = list(assignments)
+        self.position = {assignment: index for index, assignment in enumerate(self.assignments)}
+        for row, col in self.assignments:
+            self.row_cols[row].add(col)
+            self.col_staff[col].add(row)
+            self.open_slots[col] -= 1
+        self.row_costs = [self.row_cost(row, cols) for row, cols in enumerate(self.row_cols)]
+        self.cost = sum(self.row_costs)
+
+    def row_cost(self, row, cols):
+        total = 0.0
+        for col in cols:
+            day, week = self.day[col], self.week[col]
+            previous_end = max([self.last_end[row][day - 1]] + [self.end[other] for other in cols if self.day[other] == day - 1])
+            minutes = self.week_minutes[row][week] + sum(self.end[other] - self.start[other] for other in cols if self.week[other] == week)
+            cost = self.edge_cost[row * self.n_cols + col]
+            if self.start[col] - previous_end < MIN_REST_MINUTES:
+                cost += REST_GAP_PENALTY
+            if minutes > self.max_minutes[row]:
+                cost += WEEKLY_HOURS_PENALTY
+            total += max(cost, 0)
+        return total
+
+    def fits(self, row, col, cols):
+        """Whether the employee can add `col` to the shifts `cols` of this run."""
+        if row * self.n_cols + col not in self.edge_cost:
+            return False
+        start, end, week = self.start[col], self.end[col], self.week[col]
+        if self.timeline.overlaps(row, start, end):
+            return False
+        if any(self.start[other] < end and start < self.end[other] for other in cols):
+            return False
+        minutes = self.week_minutes[row][week] + end - start
+        minutes += sum(self.end[other] - self.start[other] for other in cols if self.week[other] == week)
+        return minutes <= self.max_minutes[row]
+
+    def apply(self, changes, open_slots=0):
+        """Move to the employees' new sets of shifts `changes` if that lowers the objective."""
+        costs = {row: self.row_cost(row, cols) for row, cols in changes.items()}
+        delta = sum(costs[row] - self.row_costs[row] for row in changes) - OPEN_SLOT_COST * open_slots
+        if delta >= 0:
+            return False
+        for row, cols in changes.items():
+            self.row_cols[row] = cols
+            self.row_costs[row] = costs[row]
+        self.cost += delta + OPEN_SLOT_COST * open_slots
+        return True
+
+    def reassign(self, index, row):
+        """Hand assignment `index` over to `row`."""
+        old_row, col = self.assignments[index]
+        if row in self.col_staff[col] or not self.fits(row, col, self.row_cols[row]):
+            return False
+        if not self.apply({old_row: self.row_cols[old_row] - {col}, row: self.row_cols[row] | {col}}):
+            return False
+        self.col_staff[col] ^= {old_row, row}
+        self.place(index, (row, col))
+        return True
+
+    def swap(self, index, other_index):
+        """Exchange the shifts of two assignments between their employees."""
+        (row, col), (other_row, other_col) = self.assignments[index], self.assignments[other_index]
+        if (row == other_row or col == other_col
+                or row in self.col_staff[other_col] or other_row in self.col_staff[col]):
+            return False
+        cols, other_cols = self.row_cols[row] - {col}, self.row_cols[other_row] - {other_col}
+        if not (self.fits(row, other_col, cols) and self.fits(other_row, col, other_cols)):
+            return False
+        if not self.apply({row: cols | {other_col}, other_row: other_cols | {col}}):
+            return False
+        self.col_staff[col] ^= {row, other_row}
+        self.col_staff[other_col] ^= {row, other_row}
+        self.place(index, (other_row, col))
+        self.place(other_index, (row, other_col))
+        return True
+
+    def fill(self, col, row):
+        """Staff an open slot of `col` with `row`."""
+        if row in self.col_staff[col] or not self.fits(row, col, self.row_cols[row]):
+            return False
+        if not self.apply({row: self.row_cols[row] | {col}}, open_slots=1):
+            return False
+        self.col_staff[col].add(row)
+        self.open_slots[col] -= 1
+        self.assignments.append(None)
+        self.place(len(self.assignments) - 1, (row, col))
+        return True
+
+    def place(self, index, assignment):
+        self.position.pop(self.assignments[index], None)
+        self.assignments[index] = assignment
+        self.position[assignment] = index
+
+    def step(self, rng, open_cols):
+        """Try one random move and return whether it was made."""
+        if open_cols and (not self.assignments or rng.random() < 0.2):
+            col = rng.choice(open_cols)
+            if self.fill(col, rng.choice(self.col_rows[col])):
+                if not self.open_slots[col]:
+                    open_cols.remove(col)
+                return True
+            return False
+
+        index = rng.randrange(len(self.assignments))
+        row, col = self.assignments[index]
+        other_row = rng.choice(self.col_rows[col])
+        if other_row == row:
+            return False
+        if self.reassign(index, other_row):
+            return True
+        other_cols = self.row_cols[other_row]
+        if not other_cols:
+            return False
+        other_col = rng.choice(list(other_cols))
+        return self.swap(index, self.position[other_row, other_col])
+
+    def run(self, time_budget, report=None, rng=None):
+        """Make improving moves until `time_budget` seconds have passed or none is found for a while."""
+        rng = rng or random.Random(0)
+        report = report or (lambda best: None)
+        open_cols = [col for col, slots in enumerate(self.open_slots) if slots > 0 and self.col_rows[col]]
+        started = reported = time.perf_counter()
+        stale = 0
+        while (self.assignments or open_cols) and stale < MAX_STALE_MOVES:
+            now = time.perf_counter()
+            if now - started >= time_budget:
+                break
+            if self.step(rng, open_cols):
+                stale = 0
+                if now - reported >= REPORT_INTERVAL:
+                    report(self.progress(now - started))
+                    reported = now
+            else:
+                stale += 1
+        report(self.progress(time.perf_counter() - started))
+
+    def progress(self, seconds):
+        return {'objective': self.cost, 'open_slots': sum(self.open_slots), 'seconds': seconds}
+
+
+def solve_anytime(model, required, workers=None, time_budget=None, report=None, seed=0, **options):
+    """
+    Start from the greedy schedule and improve it with local search (reassigning a
+    shift to another employee, swapping shifts between two employees and staffing
+    open slots) for up to `time_budget` seconds. `report` is called with the best
+    objective, open slots and elapsed seconds as they improve. Returns (row, col)
+    pairs like solve_staffing().
+    """
+    timeline = model.timeline.take(np.arange(model.shape[0]))
+    search = LocalSearch(model, required, solve_greedy(model, required), timeline)
+    search.run(DEFAULT_TIME_BUDGET if time_budget is None else time_budget, report, random.Random(seed))
+
+    # Replay the improved schedule on the state from before the greedy pass
+    model.timeline = timeline
+    for row, col in search.assignments:
+        model.assign(row, col)
+    return search.assignments
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SchedulerConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "scheduler"
+
+    def ready(self):
+        # Connect the receivers that keep the feature cache and the weekly-hours ledger current
+        from . import signals  # noqa: F401
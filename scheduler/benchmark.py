@@ -0,0 +1,36 @@
+import subprocess
+
+from django.conf import settings
+
+from .instrumentation import instrument
+from .models import Schedule, SchedulingResult
+from .scheduling import create_schedule
+
+
+def benchmark_schedule(workers=None, **window):
+    """Run create_schedule once and return its per-phase timings and query counts."""
+    assigned_before = Schedule.objects.count()
+    with instrument('benchmark') as total:
+        total_satisfaction, unassigned_shifts = create_schedule(workers=workers, **window)
+    result = SchedulingResult.objects.latest('created_at')
+    return {
+        **total.as_dict(),
+        'phases': result.phases,
+        'feasible_pairs': result.feasible_pairs,
+        'objective': result.objective,
+        'peak_memory': result.peak_memory,
+        'solver': result.solver_backend,
+        'assignments': Schedule.objects.count() - assigned_before,
+        'unassigned_shifts': unassigned_shifts,
+        'total_satisfaction': total_satisfaction
+    }
+
+
+def code_version():
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+from .models import AvailabilityException, EmployeeFeaturesVersion, EmployeeRole, Schedule, Shift
+
+# Seconds an entry lives at most, bounding how long a write made without the ORM's
+# signals or the version bumps (QuerySet.update(), raw SQL) can go unnoticed
+CACHE_TIMEOUT = 10 * 60
+
+
+def scheduler_cache():
+    return caches[getattr(settings, 'SCHEDULER_CACHE', 'default')]
+
+
+def cache_usable():
+    # Inside a transaction reads may include uncommitted rows, which must not reach
+    # other processes, and the invalidations of its own writes wait for the commit
+    return not connection.in_atomic_block
+
+
+def employee_key(employee_id):
+    return f'scheduler:employee:{employee_id}'
+
+
+def shift_key(shift_id):
+    return f'scheduler:shift:{shift_id}'
+
+
+def employee_stamp(employee, version):
+    # The employee's own fields and the version its roles and exceptions are at. An
+    # entry is only used while the freshly loaded state still matches it, so a change
+    # made by another process, whose signals cleared only its own cache, is never served
+    return (
+        version, employee.satisfaction_score, employee.max_hours_per_week,
+        employee.availability_mask, employee.preference_mask
+    )
+
+
+def employee_features(employees):
+    """
+    Feature vector of each employee, as dicts in the order of `employees`: the
+    `satisfaction`, `max_minutes`, weekly `availability_mask` and `preference_mask`,
+    the highest rating of each role in `ratings`, and the availability `exceptions`
+    as (start_date, end_date, shift_times, kind) in the order they were created.
+
+    Entries missing from the cache, or stamped with an older state of the employee
+    than the instance passed in and its EmployeeFeaturesVersion, are built with two
+    queries and stored.
+    """
+    cache = scheduler_cache()
+    cached = cache.get_many([employee_key(e.id) for e in employees]) if cache_usable() else {}
+    versions = EmployeeFeaturesVersion.objects.current([e.id for e in employees])
+    stamps = {e.id: employee_stamp(e, versions[e.id]) for e in employees}
+    missing = [e for e in employees if cached.get(employee_key(e.id), {}).get('stamp') != stamps[e.id]]
+    if missing:
+        built = {
+            e.id: {
+                'stamp': stamps[e.id],
+                'satisfaction': e.satisfaction_score,
+                'max_minutes': e.max_hours_per_week * 60,
+                'availability_mask': e.availability_mask,
+                'preference_mask': e.preference_mask,
+                'ratings': {},
+                'exceptions': [],
+            }
+            for e in missing
+        }
+        for employee_id, role, rating in EmployeeRole.objects.filter(employee__in=missing).values_list('employee_id', 'role', 'rating'):
+            ratings = built[employee_id]['ratings']
+            ratings[role] = max(ratings.get(role, 0), rating)
+        exceptions = AvailabilityException.objects.filter(employee__in=missing).order_by('id').values_list(
+            'employee_id', 'start_date', 'end_date', 'shift_times', 'kind'
+        )
+        for employee_id, *exception in exceptions:
+            built[employee_id]['exceptions'].append(tuple(exception))
+        if cache_usable():
+            cache.set_many({employee_key(employee_id): features for employee_id, features in built.items()}, CACHE_TIMEOUT)
+        cached.update((employee_key(employee_id), features) for employee_id, features in built.items())
+    return [cached[employee_key(e.id)] for e in employees]
+
+
+def shift_descriptors(shift_ids, version):
+    """
+    Descriptor of each shift, keyed by id in the order of `shift_ids`: its `role`,
+    `date` and `shift_time`, and the ids of the employees it is assigned to in
+    `staff`. `version` is the current ScheduleVersion; entries built at another one
+    are rebuilt, so are entries missing from the cache, with two queries, and stored.
+    """
+    cache = scheduler_cache()
+    cached = cache.get_many([shift_key(shift_id) for shift_id in shift_ids]) if cache_usable() else {}
+    descriptors = {
+        int(key.rsplit(':', 1)[1]): descriptor for key, descriptor in cached.items() if descriptor['version'] == version
+    }
+    missing = [shift_id for shift_id in shift_ids if shift_id not in descriptors]
+    if missing:
+        built = {
+            shift_id: {'version': version, 'role': role, 'date': date, 'shift_time': shift_time, 'staff': []}
+            for shift_id, role, date, shift_time in Shift.objects.filter(pk__in=missing).values_list('id', 'role', 'date', 'shift_time')
+        }
+        for employee_id, shift_id in Schedule.objects.filter(shift_id__in=missing).order_by('id').values_list('employee_id', 'shift_id'):
+            built[shift_id]['staff'].append(employee_id)
+        if cache_usable():
+            cache.set_many({shift_key(shift_id): descriptor for shift_id, descriptor in built.items()}, CACHE_TIMEOUT)
+        descriptors.update(built)
+    return {shift_id: descriptors[shift_id] for shift_id in shift_ids if shift_id in descriptors}
+
+
+def forget_employees(employee_ids):
+    scheduler_cache().delete_many([employee_key(employee_id) for employee_id in employee_ids])
+
+
+def forget_shifts(shift_ids):
+    scheduler_cache().delete_many([shift_key(shift_id) for shift_id in shift_ids])
@@ -0,0 +1,166 @@
+import numpy as np
+
+BASE_COST = 100
+RATING_WEIGHT = 10
+PREFERRED_SHIFT_BONUS = 20
+SATISFACTION_WEIGHT = 0.5
+MIN_REST_MINUTES = 12 * 60
+REST_GAP_PENALTY = 30
+WEEKLY_HOURS_PENALTY = 50
+
+
+class CostModel:
+    """
+    Inputs of calculate_cost for an employee x shift grid, held as NumPy arrays.
+
+    Only feasible pairs are kept: every edge is an employee row holding the shift's
+    role and available for it, so memory grows with the number of feasible
+    pairs rather than employees x shifts. Edges are sorted by row.
+
+    Times are minutes from `origin` (a Monday at midnight); days and weeks are indexes
+    counted from the same origin. `timeline` holds the shifts the employees are
+    already working and is updated by assign(). The model has no database access, so
+    it can be pickled and handed to worker processes.
+    """
+
+    def __init__(self, employee_ids, shift_ids, origin, edge_row, edge_col, edge_rating,
+                 edge_preferred, satisfaction, max_minutes, shift_start, shift_end, shift_day,
+                 timeline):
+        order = np.argsort(edge_row, kind='stable')
+        self.employee_ids = np.asarray(employee_ids)
+        self.shift_ids = np.asarray(shift_ids)
+        self.origin = origin
+        self.edge_row = np.asarray(edge_row, dtype=np.int64)[order]
+        self.edge_col = np.asarray(edge_col, dtype=np.int64)[order]
+        self.edge_rating = np.asarray(edge_rating, dtype=float)[order]
+        self.edge_preferred = np.asarray(edge_preferred, dtype=bool)[order]
+        self.satisfaction = satisfaction    # employees
+        self.max_minutes = max_minutes      # employees
+        self.shift_start = shift_start      # shifts
+        self.shift_end = shift_end          # shifts
+        self.shift_day = shift_day          # shifts
+        self.timeline = timeline
+        self.indptr = np.searchsorted(self.edge_row, np.arange(len(self.employee_ids) + 1))
+
+    @property
+    def shape(self):
+        return len(self.employee_ids), len(self.shift_ids)
+
+    @property
+    def shift_week(self):
+        return self.shift_day // 7
+
+    @property
+    def shift_minutes(self):
+        return self.shift_end - self.shift_start
+
+    def row_edges(self, row):
+        return slice(self.indptr[row], self.indptr[row + 1])
+
+    def base_costs(self, edges=slice(None)):
+        return (BASE_COST
+                - self.edge_rating[edges] * RATING_WEIGHT
+                - self.edge_preferred[edges] * PREFERRED_SHIFT_BONUS
+                - self.satisfaction[self.edge_row[edges]] * SATISFACTION_WEIGHT)
+
+    def penalties(self):
+        # Weekly hours limit
+        over_hours = ~self.within_hours()
+
+        return self.short_rest() * REST_GAP_PENALTY + over_hours * WEEKLY_HOURS_PENALTY
+
+    def short_rest(self):
+        """Less than 12 hours since the end of a shift assigned on the previous day."""
+        rows, cols = self.edge_row, self.edge_col
+        rest_gap = self.shift_start[cols] - self.timeline.last_end[rows, self.shift_day[cols] - 1]
+        return rest_gap < MIN_REST_MINUTES
+
+    def edge_costs(self):
+        return np.maximum(self.base_costs() + self.penalties(), 0)
+
+    def matrix(self):
+        """Dense employees x shifts costs, inf where the pair is infeasible."""
+        costs = np.full(self.shape, np.inf)
+        costs[self.edge_row, self.edge_col] = self.edge_costs()
+        return costs
+
+    def edge_index(self, rows, cols):
+        """Positions of the (row, col) edges, which must all exist."""
+        keys = self.edge_row * self.shape[1] + self.edge_col
+        order = np.argsort(keys)
+        return order[np.searchsorted(keys[order], np.asarray(rows) * self.shape[1] + np.asarray(cols))]
+
+    def assignment_costs(self, rows, cols):
+        """
+        Cost of each (row, col) assignment of a finished schedule, once `timeline`
+        holds all of it: the rest gap is checked against every shift of the previous
+        day and the weekly hours against the whole week.
+        """
+        edges = self.edge_index(rows, cols)
+        rows, cols = self.edge_row[edges], self.edge_col[edges]
+        rest_gap = self.shift_start[cols] - self.timeline.last_end[rows, self.shift_day[cols] - 1]
+        over_hours = self.timeline.week_minutes[rows, self.shift_week[cols]] > self.max_minutes[rows]
+        penalties = (rest_gap < MIN_REST_MINUTES) * REST_GAP_PENALTY + over_hours * WEEKLY_HOURS_PENALTY
+        return np.maximum(self.base_costs(edges) + penalties, 0)
+
+    def within_hours(self):
+        rows, cols = self.edge_row, self.edge_col
+        weekly = self.timeline.week_minutes[rows, self.shift_week[cols]] + self.shift_minutes[cols]
+        return weekly <= self.max_minutes[rows]
+
+    def overlapping(self, row):
+        """Whether each of the row's edges overlaps a shift the employee already works."""
+        cols = self.edge_col[self.row_edges(row)]
+        return self.timeline.overlapping(row, self.shift_start[cols], self.shift_end[cols])
+
+    def blocked(self):
+        blocked = np.zeros(self.edge_row.size, dtype=bool)
+        for row in self.timeline.busy_rows():
+            blocked[self.row_edges(row)] = self.overlapping(row)
+        return blocked
+
+    def take(self, rows, cols):
+        """Sub-model for the given employee rows and shift columns, with its own copy of the state."""
+        row_map = np.full(self.shape[0], -1)
+        row_map[rows] = np.arange(len(rows))
+        col_map = np.full(self.shape[1], -1)
+        col_map[cols] = np.arange(len(cols))
+        keep = (row_map[self.edge_row] >= 0) & (col_map[self.edge_col] >= 0)
+        return CostModel(
+            employee_ids=self.employee_ids[rows],
+            shift_ids=self.shift_ids[cols],
+            origin=self.origin,
+            edge_row=row_map[self.edge_row[keep]],
+            edge_col=col_map[self.edge_col[keep]],
+            edge_rating=self.edge_rating[keep],
+            edge_preferred=self.edge_preferred[keep],
+            satisfaction=self.satisfaction[rows],
+            max_minutes=self.max_minutes[rows],
+            shift_start=self.shift_start[cols],
+            shift_end=self.shift_end[cols],
+            shift_day=self.shift_day[cols],
+            timeline=self.timeline.take(rows),
+        )
+
+    def seed(self, pairs, required):
+        """
+        Assign the (row, col) pairs of an earlier schedule that are still feasible, in
+        order and up to `required[col]` per shift, and keep them fixed. Returns the
+        kept pairs and the slots still open on each shift.
+        """
+        open_slots = np.array(required, dtype=np.int64)
+        edges = set((self.edge_row * self.shape[1] + self.edge_col).tolist())
+        kept = []
+        for row, col in pairs:
+            start, end = self.shift_start[col], self.shift_end[col]
+            if (open_slots[col] > 0
+                    and row * self.shape[1] + col in edges
+                    and not self.timeline.overlaps(row, start, end)
+                    and self.timeline.weekly_minutes(row, start) + end - start <= self.max_minutes[row]):
+                self.assign(row, col)
+                open_slots[col] -= 1
+                kept.append((int(row), int(col)))
+        return kept, open_slots
+
+    def assign(self, row, col):
+        self.timeline.add(row, self.shift_start[col], self.shift_end[col])
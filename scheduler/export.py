@@ -0,0 +1,78 @@
+import csv
+from datetime import timezone as dt_timezone
+
+from django.utils import timezone
+
+# Rows fetched per round trip; PostgreSQL streams them through a server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+
+CSV_HEADER = ['schedule_id', 'employee_id', 'employee', 'role', 'date', 'shift_time', 'start', 'end']
+
+# Lines of an iCalendar file are folded at 75 octets
+ICS_LINE_LENGTH = 75
+
+
+class Echo:
+    """File-like object handing back what csv.writer writes, so rows can be streamed."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(schedules):
+    """The assignments in listing() order, fetched in chunks instead of all at once."""
+    return schedules.listing().iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def csv_lines(schedules):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for schedule in export_rows(schedules):
+        shift = schedule.shift
+        start, end = shift.get_shift_datetimes()
+        yield writer.writerow([
+            schedule.pk, schedule.employee_id, schedule.employee.name, shift.role, shift.date,
+            shift.shift_time, start.isoformat(timespec='minutes'), end.isoformat(timespec='minutes')
+        ])
+
+
+def ics_escape(text):
+    return str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def ics_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def ics_line(line):
+    # Continuation lines start with a space, which counts towards their length
+    encoded = line.encode()
+    parts = []
+    while len(encoded) > ICS_LINE_LENGTH:
+        cut = ICS_LINE_LENGTH - (1 if parts else 0)
+        while encoded[cut] & 0xC0 == 0x80:  # Never split a UTF-8 character
+            cut -= 1
+        parts.append(encoded[:cut])
+        encoded = encoded[cut:]
+    parts.append(encoded)
+    return (b'\r\n '.join(parts) + b'\r\n').decode()
+
+
+def ics_lines(schedules, name, domain='staff-scheduling'):
+    """An iCalendar feed called `name` with one event per assignment, ending on the next day for overnight shifts."""
+    stamp = ics_datetime(timezone.now())
+    for line in ('BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Staff Scheduling//Schedule//EN',
+                 'CALSCALE:GREGORIAN', f'X-WR-CALNAME:{ics_escape(name)}'):
+        yield ics_line(line)
+    for schedule in export_rows(schedules):
+        shift = schedule.shift
+        for line in ('BEGIN:VEVENT',
+                     f'UID:schedule-{schedule.pk}@{domain}',
+                     f'DTSTAMP:{stamp}',
+                     f'DTSTART:{ics_datetime(shift.start_datetime)}',
+                     f'DTEND:{ics_datetime(shift.end_datetime)}',
+                     f'SUMMARY:{ics_escape(shift.get_role_display())} ({ics_escape(shift.get_shift_time_display())})',
+                     f'DESCRIPTION:{ics_escape(schedule.employee.name)}',
+                     'END:VEVENT'):
+            yield ics_line(line)
+    yield ics_line('END:VCALENDAR')
@@ -1,6 +1,8 @@
+import datetime
+
 from django import forms
-from django.utils import timezone
-from .models import Employee, Shift, EmployeeRole, Role, ShiftTime
+from .solvers import SOLVER_CHOICES
+from .models import Employee, Shift, EmployeeRole, AvailabilityException, Role, ShiftTime, WarmStartSource, SHIFT_TIME_CODES, weekly_bit
 
 class AvailabilityForm(forms.Form):
     DAYS = [
@@ -18,6 +20,28 @@ class AvailabilityForm(forms.Form):
             field_name = f'{day}_{shift_time}'
             locals()[field_name] = forms.BooleanField(label=f'{day_name} {shift_name}', required=False)
 
+    SHIFT_TIMES = ShiftTime.choices
+
+    @classmethod
+    def initial_from_mask(cls, mask):
+        return {
+            f'{day}_{shift_time}': bool(mask & weekly_bit(weekday, shift_time))
+            for weekday, (day, _) in enumerate(cls.DAYS) for shift_time in ShiftTime.values
+        }
+
+    def to_mask(self):
+        return sum(
+            weekly_bit(weekday, shift_time)
+            for weekday, (day, _) in enumerate(self.DAYS) for shift_time in ShiftTime.values
+            if self.cleaned_data[f'{day}_{shift_time}']
+        )
+
+    def rows(self):
+        return [
+            (day_name, [self[f'{day}_{shift_time}'] for shift_time in ShiftTime.values])
+            for day, day_name in self.DAYS
+        ]
+
 class EmployeeForm(forms.ModelForm):
     class Meta:
         model = Employee
@@ -33,24 +57,110 @@ EmployeeRoleFormSet = forms.inlineformset_factory(
 )
 
 class EmployeePreferencesForm(forms.ModelForm):
-    preferred_shifts = forms.ModelMultipleChoiceField(
-        queryset=Shift.objects.all(),
-        widget=forms.CheckboxSelectMultiple,
-        required=False
-    )
-
     class Meta:
         model = Employee
-        fields = ['max_hours_per_week', 'preferred_shifts']
+        fields = ['max_hours_per_week']
+
+class AvailabilityExceptionForm(forms.ModelForm):
+    shift_times = forms.MultipleChoiceField(choices=ShiftTime.choices, widget=forms.CheckboxSelectMultiple)
+
+    class Meta:
+        model = AvailabilityException
+        fields = ['start_date', 'end_date', 'shift_times', 'kind']
+        widgets = {
+            'start_date': forms.DateInput(attrs={'type': 'date'}),
+            'end_date': forms.DateInput(attrs={'type': 'date'}),
+        }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['preferred_shifts'].queryset = Shift.objects.filter(date__gte=timezone.now().date())
+        mask = self.initial.get('shift_times', self.instance.shift_times)
+        if isinstance(mask, int):
+            self.initial['shift_times'] = [t for t, code in SHIFT_TIME_CODES.items() if mask & (1 << code)]
+
+    def clean_shift_times(self):
+        return sum(1 << SHIFT_TIME_CODES[shift_time] for shift_time in self.cleaned_data['shift_times'])
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date, end_date = cleaned_data.get('start_date'), cleaned_data.get('end_date')
+        if start_date and end_date and end_date < start_date:
+            raise forms.ValidationError("The end date must not be before the start date.")
+        return cleaned_data
 
 class ShiftGenerationForm(forms.Form):
     start_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
     end_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
 
+class ScheduleHorizonForm(forms.Form):
+    start_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    roles = forms.MultipleChoiceField(choices=Role.choices, required=False, widget=forms.CheckboxSelectMultiple)
+    solver = forms.ChoiceField(choices=SOLVER_CHOICES, required=False)
+    time_budget = forms.FloatField(
+        required=False, min_value=0.1, max_value=3600,
+        help_text="Seconds the greedy with local search solver may spend improving the schedule"
+    )
+    warm_start = forms.ChoiceField(
+        choices=[('', 'None')] + WarmStartSource.choices, required=False,
+        help_text="Keep the assignments of an earlier schedule that still fit and only solve the rest"
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date, end_date = cleaned_data.get('start_date'), cleaned_data.get('end_date')
+        if start_date and end_date and end_date < start_date:
+            raise forms.ValidationError("The end date must not be before the start date.")
+        return cleaned_data
+
+class ScheduleCursorField(forms.CharField):
+    """
+    Keyset position in ScheduleQuerySet.listing() order, written as
+    "date.shift_time.id" of the last assignment shown. It holds the sort key itself
+    rather than a reference to the row, so it stays valid after the row is deleted.
+    """
+    widget = forms.HiddenInput
+
+    @staticmethod
+    def encode(schedule):
+        return f'{schedule.shift.date.isoformat()}.{schedule.shift.shift_time}.{schedule.pk}'
+
+    def to_python(self, value):
+        value = super().to_python(value)
+        if not value:
+            return None
+        try:
+            date, shift_time, pk = value.split('.')
+            if shift_time not in ShiftTime.values:
+                raise ValueError(shift_time)
+            return datetime.date.fromisoformat(date), shift_time, int(pk)
+        except ValueError:
+            raise forms.ValidationError("Invalid page position.", code='invalid')
+
+class ScheduleFilterForm(forms.Form):
+    start_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    role = forms.ChoiceField(choices=[('', 'All roles')] + Role.choices, required=False)
+    employee = forms.ModelChoiceField(queryset=Employee.objects.order_by('name'), required=False, empty_label='All employees')
+    after = ScheduleCursorField(required=False)
+    limit = forms.IntegerField(required=False, min_value=1, max_value=500, widget=forms.HiddenInput)
+
+    def filter(self, schedules):
+        """The schedules matching the cleaned filters, ignoring the page position."""
+        if self.cleaned_data['start_date']:
+            schedules = schedules.filter(shift__date__gte=self.cleaned_data['start_date'])
+        if self.cleaned_data['end_date']:
+            schedules = schedules.filter(shift__date__lte=self.cleaned_data['end_date'])
+        if self.cleaned_data['role']:
+            schedules = schedules.filter(shift__role=self.cleaned_data['role'])
+        if self.cleaned_data['employee']:
+            schedules = schedules.filter(employee=self.cleaned_data['employee'])
+        return schedules
+
+class ReplacementQueryForm(forms.Form):
+    limit = forms.IntegerField(required=False, min_value=1, max_value=50)
+    exclude = forms.ModelMultipleChoiceField(queryset=Employee.objects.all(), required=False)
+
 class ShiftForm(forms.ModelForm):
     class Meta:
         model = Shift
@@ -0,0 +1,36 @@
+def solve_greedy(model, required, workers=None, **options):
+    """
+    Take the cheapest edges first, with the costs as they stand before the run,
+    skipping those whose shift is already staffed, that overlap a shift the
+    employee works or that would push them past max_hours_per_week.
+
+    Needs no SciPy: the edges are sorted and walked in plain Python over lists
+    taken from the cost model, in one pass. Meant for instances too small to be
+    worth a matching; the anytime backend starts from its result. `workers` and
+    other options are accepted for a uniform backend interface and ignored.
+    Returns (row, col) pairs like solve_staffing().
+    """
+    open_slots = [int(slots) for slots in required]
+    remaining = sum(open_slots)
+    rows, cols = model.edge_row.tolist(), model.edge_col.tolist()
+    starts, ends = model.shift_start.tolist(), model.shift_end.tolist()
+    max_minutes = model.max_minutes.tolist()
+    timeline = model.timeline
+    assignments = []
+
+    costs = model.edge_costs().tolist()
+    for edge in sorted(range(len(costs)), key=costs.__getitem__):
+        if not remaining:
+            break
+        row, col = rows[edge], cols[edge]
+        start, end = starts[col], ends[col]
+        if (open_slots[col] <= 0
+                or timeline.overlaps(row, start, end)
+                or timeline.weekly_minutes(row, start) + end - start > max_minutes[row]):
+            continue
+        model.assign(row, col)
+        open_slots[col] -= 1
+        remaining -= 1
+        assignments.append((row, col))
+
+    return assignments
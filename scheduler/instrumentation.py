@@ -0,0 +1,222 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'SERVER_TIMING': False,
+    'MAX_QUERIES': None,
+    'MAX_DUPLICATE_QUERIES': None,
+    'RAISE_ON_THRESHOLD': False,
+}
+
+
+class QueryThresholdExceeded(Exception):
+    pass
+
+
+def instrumentation_setting(name):
+    return getattr(settings, 'SCHEDULER_INSTRUMENTATION', {}).get(name, DEFAULTS[name])
+
+
+# Seconds between two samples of the resident memory during a scheduling run
+MEMORY_SAMPLE_INTERVAL = 0.05
+
+
+def resident_memory():
+    """Current resident memory of this process in bytes, or None where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class PeakMemory:
+    """
+    Highest resident memory of this process while the block runs, in bytes, sampled
+    every MEMORY_SAMPLE_INTERVAL seconds on a background thread; None where it cannot
+    be read. Unlike ru_maxrss, which only ever grows over the life of the process, it
+    describes one run. Runs sharing the process (the worker's threads) are included,
+    the pool processes solving blocks are not.
+    """
+
+    def __init__(self, interval=MEMORY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        current = resident_memory()
+        if current is not None:
+            self.peak = max(self.peak or 0, current)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._run, name='peak-memory', daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.sample()
+
+
+class Measurement:
+    """
+    Queries, database time and wall time of a block of work. Used as a database
+    execute wrapper, it also counts how often each SQL statement ran, since the same
+    statement repeated with different parameters is the signature of an N+1 query.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        """Runs of the most repeated statement."""
+        return max(self.statements.values(), default=0)
+
+    def as_dict(self):
+        return {
+            'seconds': self.seconds,
+            'db_seconds': self.db_seconds,
+            'queries': self.queries,
+            'duplicates': self.duplicates
+        }
+
+    def server_timing(self):
+        return (f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries", '
+                f'total;dur={self.seconds * 1000:.1f}')
+
+    def exceeded(self, max_queries=None, max_duplicates=None):
+        """Descriptions of the thresholds this measurement is over."""
+        problems = []
+        if max_queries is not None and self.queries > max_queries:
+            problems.append(f"{self.queries} queries (limit {max_queries})")
+        if max_duplicates is not None and self.duplicates > max_duplicates:
+            sql, count = self.statements.most_common(1)[0]
+            problems.append(f"a statement ran {count} times (limit {max_duplicates}), possible N+1: {sql[:200]}")
+        return problems
+
+
+@contextmanager
+def instrument(label, max_queries=None, max_duplicates=None):
+    """
+    Measure the enclosed block on every database connection and log one line with
+    its query count, database time and wall time.
+
+    Going over `max_queries` or `max_duplicates` (defaulting to MAX_QUERIES and
+    MAX_DUPLICATE_QUERIES of the SCHEDULER_INSTRUMENTATION setting) logs a warning,
+    or raises QueryThresholdExceeded when RAISE_ON_THRESHOLD is set, as in tests.
+    """
+    measurement = Measurement(label)
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(measurement))
+        try:
+            yield measurement
+        finally:
+            measurement.seconds = time.perf_counter() - started
+
+    logger.info(
+        "%s queries=%d duplicates=%d db_ms=%.1f wall_ms=%.1f",
+        measurement.label, measurement.queries, measurement.duplicates,
+        measurement.db_seconds * 1000, measurement.seconds * 1000,
+        extra={'instrumentation': {'label': measurement.label, **measurement.as_dict()}}
+    )
+    problems = measurement.exceeded(
+        instrumentation_setting('MAX_QUERIES') if max_queries is None else max_queries,
+        instrumentation_setting('MAX_DUPLICATE_QUERIES') if max_duplicates is None else max_duplicates
+    )
+    if problems:
+        message = f"{measurement.label}: {'; '.join(problems)}"
+        if instrumentation_setting('RAISE_ON_THRESHOLD'):
+            raise QueryThresholdExceeded(message)
+        logger.warning(message)
+
+
+class PhaseRecorder:
+    """
+    Progress callback for the scheduling functions that measures each phase with
+    instrument(). Use it as a context manager around the run, so the last phase is
+    closed even when the run fails; `callback` still receives every phase. The
+    outermost `with` also tracks the run's PeakMemory in `memory`.
+    """
+
+    def __init__(self, label='schedule', callback=None):
+        self.label = label
+        self.callback = callback or (lambda phase: None)
+        self.phases = {}
+        self.memory = PeakMemory()
+        self._phase = None
+        self._depth = 0
+
+    def __enter__(self):
+        if not self._depth:
+            self.memory.__enter__()
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self.finish()
+        self._depth -= 1
+        if not self._depth:
+            self.memory.__exit__(*exc_info)
+
+    def __call__(self, phase):
+        self.finish()
+        self.callback(phase)
+        self._phase = phase
+        self._context = instrument(f'{self.label} {phase}')
+        self.phases[phase] = self._context.__enter__()
+
+    def finish(self):
+        if self._phase:
+            self._phase = None
+            self._context.__exit__(None, None, None)
+
+
+class InstrumentationMiddleware:
+    """Measure every request, adding a Server-Timing header when SERVER_TIMING is set."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with instrument(f'{request.method} {request.path}') as measurement:
+            response = self.get_response(request)
+            if request.resolver_match:
+                measurement.label = f'{request.method} {request.resolver_match.view_name}'
+        if instrumentation_setting('SERVER_TIMING'):
+            response['Server-Timing'] = measurement.server_timing()
+        return response
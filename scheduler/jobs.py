@@ -0,0 +1,154 @@
+import logging
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from datetime import timedelta
+
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import SchedulingJob, JobStatus, SchedulingPhase
+
+logger = logging.getLogger(__name__)
+
+PHASES = list(SchedulingPhase.values)
+
+# Seconds between two heartbeats of a worker's running jobs, and without one after
+# which a running job is taken to have lost its worker and is marked failed
+JOB_HEARTBEAT_INTERVAL = 30
+JOB_STALE_AFTER = 300
+
+
+def enqueue_schedule(requested_by=None, **parameters):
+    # Identical requests still waiting in the queue are coalesced into one job
+    pending = SchedulingJob.objects.filter(status=JobStatus.PENDING, parameters=parameters).first()
+    return pending or SchedulingJob.objects.create(requested_by=requested_by, parameters=parameters)
+
+
+def enqueue_reschedule(requested_by=None, employees=(), shifts=()):
+    return enqueue_schedule(
+        requested_by=requested_by,
+        employees=sorted(e.pk for e in employees),
+        shifts=sorted(s.pk for s in shifts)
+    )
+
+
+def claim_next_job():
+    # The conditional update makes the claim safe between several workers on any backend
+    for job in SchedulingJob.objects.filter(status=JobStatus.PENDING).order_by('created_at')[:10]:
+        now = timezone.now()
+        claimed = SchedulingJob.objects.filter(pk=job.pk, status=JobStatus.PENDING).update(
+            status=JobStatus.RUNNING,
+            started_at=now,
+            heartbeat_at=now
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def heartbeat(job_ids):
+    SchedulingJob.objects.filter(pk__in=job_ids, status=JobStatus.RUNNING).update(heartbeat_at=timezone.now())
+
+
+def fail_stale_jobs(stale_after=JOB_STALE_AFTER):
+    """
+    Mark failed the running jobs without a heartbeat for `stale_after` seconds, whose
+    worker died or was killed mid-run. They are not run again, as whatever stopped
+    the worker may well stop the next one too. Returns how many were failed.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=stale_after)
+    stale = SchedulingJob.objects.filter(status=JobStatus.RUNNING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+    failed = stale.update(
+        status=JobStatus.FAILED,
+        error=f"The worker running this job stopped responding for more than {stale_after} seconds",
+        finished_at=now
+    )
+    if failed:
+        logger.warning("Marked %d stale scheduling job(s) as failed", failed)
+    return failed
+
+
+def report_progress(job, phase):
+    # Like every write of a worker to its job, only while the job still counts as running,
+    # so a job fail_stale_jobs gave up on stays failed
+    SchedulingJob.objects.filter(pk=job.pk, status=JobStatus.RUNNING).update(
+        phase=phase,
+        progress=PHASES.index(phase) / len(PHASES)
+    )
+
+
+def report_best(job, best):
+    # The running job's result holds the best schedule found so far
+    SchedulingJob.objects.filter(pk=job.pk, status=JobStatus.RUNNING).update(result={'best': best})
+
+
+def run_job(job):
+    # Imported here so that the web processes enqueueing jobs never load NumPy
+    from .scheduling import create_schedule, reschedule
+
+    # Jobs naming changed employees or shifts only re-solve the block they touch
+    parameters = dict(job.parameters)
+    incremental = 'employees' in parameters or 'shifts' in parameters
+    for key in ('start', 'end'):
+        if parameters.get(key):
+            parameters[key] = parse_date(parameters[key])
+    try:
+        total_satisfaction, unassigned_shifts = (reschedule if incremental else create_schedule)(
+            progress=lambda phase: report_progress(job, phase),
+            report=lambda best: report_best(job, best),
+            **parameters
+        )
+    except Exception:
+        logger.exception("Scheduling job %s failed", job.pk)
+        SchedulingJob.objects.filter(pk=job.pk, status=JobStatus.RUNNING).update(
+            status=JobStatus.FAILED,
+            error=traceback.format_exc(),
+            finished_at=timezone.now()
+        )
+    else:
+        SchedulingJob.objects.filter(pk=job.pk, status=JobStatus.RUNNING).update(
+            status=JobStatus.SUCCEEDED,
+            progress=1,
+            result={
+                'total_satisfaction': total_satisfaction,
+                'unassigned_shifts': unassigned_shifts
+            },
+            finished_at=timezone.now()
+        )
+    finally:
+        connections.close_all()  # Each worker thread holds its own connection
+
+
+def run_worker(threads=1, poll_interval=2.0, once=False):
+    """
+    Claim pending jobs and run them on a pool of `threads` threads. With `once`,
+    return as soon as the queue is drained instead of polling for new jobs.
+
+    Every JOB_HEARTBEAT_INTERVAL seconds the worker refreshes the heartbeat of the
+    jobs it runs and fails those other workers left behind (see fail_stale_jobs).
+    """
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        running = {}
+        last_beat = None
+        while True:
+            running = {future: job_id for future, job_id in running.items() if not future.done()}
+            if last_beat is None or time.monotonic() - last_beat >= JOB_HEARTBEAT_INTERVAL:
+                heartbeat(running.values())
+                fail_stale_jobs()
+                last_beat = time.monotonic()
+            job = claim_next_job() if len(running) < threads else None
+            if job:
+                logger.info("Running scheduling job %s", job.pk)
+                running[executor.submit(run_job, job)] = job.pk
+                continue
+            if once and not running:
+                return
+            time.sleep(poll_interval)
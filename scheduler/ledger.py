@@ -0,0 +1,84 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Sum, When
+from django.db.models.functions import TruncWeek
+
+from .models import EmployeeWeekHours, Schedule, Shift, SHIFT_TIMES
+
+# Rows per statement, below SQLite's limit on query parameters
+LEDGER_BATCH_SIZE = 500
+
+
+def week_of(date):
+    """Monday of the ISO week of `date`."""
+    return date - timedelta(days=date.weekday())
+
+
+def week_deltas(assignments, sign=1):
+    """Minutes per (employee_id, week) of the (employee_id, shift date, shift time) assignments, times `sign`."""
+    deltas = Counter()
+    for employee_id, date, shift_time in assignments:
+        deltas[employee_id, week_of(date)] += sign * SHIFT_TIMES[shift_time][1]
+    return deltas
+
+
+def assignment_deltas(added=(), removed=()):
+    """week_deltas() of (employee_id, shift_id) pairs added to and removed from the schedule, in one query."""
+    shift_ids = sorted({shift_id for _, shift_id in added} | {shift_id for _, shift_id in removed})
+    shifts = {}
+    for start in range(0, len(shift_ids), LEDGER_BATCH_SIZE):
+        batch = shift_ids[start:start + LEDGER_BATCH_SIZE]
+        shifts.update((pk, (date, shift_time)) for pk, date, shift_time in Shift.objects.filter(pk__in=batch).values_list('pk', 'date', 'shift_time'))
+    deltas = week_deltas((employee_id, *shifts[shift_id]) for employee_id, shift_id in added)
+    deltas.update(week_deltas(((employee_id, *shifts[shift_id]) for employee_id, shift_id in removed), sign=-1))
+    return deltas
+
+
+def apply_week_deltas(deltas):
+    """
+    Add minutes per (employee_id, week) to the ledger. The additions are done by the
+    database (INSERT ... ON CONFLICT DO UPDATE), so concurrent writers to the same row
+    add up instead of overwriting each other.
+    """
+    deltas = sorted((key, minutes) for key, minutes in deltas.items() if minutes)
+    if not deltas:
+        return
+    table = connection.ops.quote_name(EmployeeWeekHours._meta.db_table)
+    batch_size = min(LEDGER_BATCH_SIZE, connection.features.max_query_params // 3)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(deltas), batch_size):
+            batch = deltas[start:start + batch_size]
+            cursor.execute(
+                f'INSERT INTO {table} (employee_id, week, minutes) VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                f'ON CONFLICT (employee_id, week) DO UPDATE SET minutes = {table}.minutes + EXCLUDED.minutes',
+                [value for (employee_id, week), minutes in batch
+                 for value in (employee_id, connection.ops.adapt_datefield_value(week), minutes)]
+            )
+
+
+def week_minutes(employee_ids, first_week, last_week):
+    """Scheduled minutes per (employee_id, week) between the two Mondays, in one query; missing weeks are 0."""
+    return {
+        (employee_id, week): minutes
+        for employee_id, week, minutes in EmployeeWeekHours.objects.filter(
+            employee_id__in=employee_ids,
+            week__range=[first_week, last_week]
+        ).values_list('employee_id', 'week', 'minutes')
+    }
+
+
+def rebuild_week_hours():
+    """Recompute the whole ledger from Schedule, in case it drifted. Returns the number of rows written."""
+    minutes = Sum(Case(
+        *[When(shift__shift_time=shift_time, then=duration) for shift_time, (_, duration) in SHIFT_TIMES.items()],
+        output_field=IntegerField()
+    ))
+    totals = Schedule.objects.values('employee_id', week=TruncWeek('shift__date')).annotate(minutes=minutes).order_by()
+    with transaction.atomic():
+        EmployeeWeekHours.objects.all().delete()
+        return len(EmployeeWeekHours.objects.bulk_create(
+            [EmployeeWeekHours(employee_id=row['employee_id'], week=row['week'], minutes=row['minutes']) for row in totals.iterator()],
+            batch_size=LEDGER_BATCH_SIZE
+        ))
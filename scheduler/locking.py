@@ -0,0 +1,157 @@
+import time
+import uuid
+import zlib
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import SchedulingLock
+
+# Seconds a run waits for the locks before giving up
+LOCK_TIMEOUT = 600
+
+# Seconds after which a lock row left behind by a crashed run can be taken over
+LOCK_LEASE = 6 * 60 * 60
+
+# Seconds between two attempts to take the locks, doubling up to the maximum
+LOCK_POLL_INTERVAL = 0.05
+LOCK_MAX_POLL_INTERVAL = 2.0
+
+# First key of the two-key pg_advisory_lock(), which keeps clear of other applications' locks
+ADVISORY_LOCK_NAMESPACE = 0x5343
+
+
+class LockTimeout(Exception):
+    pass
+
+
+def lock_keys(roles, first_date, last_date):
+    """
+    One key per role and week touched by a run over the given dates. The days on
+    either side are included, as the rest gap reaches into them.
+    """
+    if first_date is None or last_date is None:
+        return []
+    day = first_date - timedelta(days=1)
+    monday = day - timedelta(days=day.weekday())
+    keys = []
+    while monday <= last_date + timedelta(days=1):
+        keys.extend(f'{role}:{monday.isoformat()}' for role in roles)
+        monday += timedelta(days=7)
+    return sorted(keys)
+
+
+def employee_lock_keys(assignments):
+    """
+    One key per employee and week touched by their (employee_id, date) assignments,
+    the days on either side included, for runs over different roles that share staff.
+    """
+    keys = set()
+    for employee_id, date in assignments:
+        for day in (date - timedelta(days=1), date + timedelta(days=1)):
+            keys.add(f'employee:{employee_id}:{(day - timedelta(days=day.weekday())).isoformat()}')
+    return sorted(keys)
+
+
+class ScheduleLock:
+    """
+    Locks on a set of keys, taken all at once or not at all, so two runs never wait
+    on each other in a cycle. On PostgreSQL they are session advisory locks, released
+    when the connection closes even if the run crashes; elsewhere they are
+    SchedulingLock rows with a lease.
+
+    A run that waited works on the schedule as the run it waited for left it, so an
+    overlapping run only fills what that one left open.
+    """
+
+    def __init__(self, keys, timeout=LOCK_TIMEOUT):
+        self.keys = sorted(set(keys))
+        self.timeout = timeout
+        self.owner = uuid.uuid4().hex
+        self.wait_seconds = 0.0
+        self._acquired = None
+
+    @property
+    def held_seconds(self):
+        return time.perf_counter() - self._acquired if self._acquired else 0.0
+
+    def __enter__(self):
+        started = time.perf_counter()
+        interval = LOCK_POLL_INTERVAL
+        while not self._try_acquire():
+            if time.perf_counter() - started >= self.timeout:
+                raise LockTimeout(f"Gave up waiting for scheduling locks after {self.timeout}s: {', '.join(self.keys)}")
+            time.sleep(interval)
+            interval = min(interval * 2, LOCK_MAX_POLL_INTERVAL)
+        self._acquired = time.perf_counter()
+        self.wait_seconds = self._acquired - started
+        return self
+
+    def __exit__(self, *exc_info):
+        self._release()
+
+    def _try_acquire(self):
+        if not self.keys:
+            return True
+        if connection.vendor == 'postgresql':
+            return self._try_advisory_locks()
+        return self._try_lock_rows()
+
+    def _release(self):
+        if not self.keys:
+            return
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_advisory_unlock(%s, k) FROM unnest(%s::integer[]) AS k',
+                    [ADVISORY_LOCK_NAMESPACE, self.advisory_keys()]
+                )
+        else:
+            SchedulingLock.objects.filter(owner=self.owner).delete()
+
+    def advisory_keys(self):
+        # crc32 is stable across processes, unlike hash(), and fits the integer key
+        return [zlib.crc32(key.encode()) - 2 ** 31 for key in self.keys]
+
+    def _try_advisory_locks(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT k FROM unnest(%s::integer[]) AS k WHERE pg_try_advisory_lock(%s, k)',
+                [self.advisory_keys(), ADVISORY_LOCK_NAMESPACE]
+            )
+            taken = [k for k, in cursor.fetchall()]
+            if len(taken) == len(self.keys):
+                return True
+            cursor.execute(
+                'SELECT pg_advisory_unlock(%s, k) FROM unnest(%s::integer[]) AS k',
+                [ADVISORY_LOCK_NAMESPACE, taken]
+            )
+            return False
+
+    def _try_lock_rows(self):
+        now = timezone.now()
+        SchedulingLock.objects.filter(key__in=self.keys, expires_at__lt=now).delete()
+        try:
+            with transaction.atomic():
+                SchedulingLock.objects.bulk_create([
+                    SchedulingLock(key=key, owner=self.owner, expires_at=now + timedelta(seconds=LOCK_LEASE))
+                    for key in self.keys
+                ])
+        except IntegrityError:
+            return False
+        return True
+
+
+def horizon_lock(roles, first_date, last_date, timeout=LOCK_TIMEOUT):
+    """
+    ScheduleLock for a run over `roles` between the two dates. Runs over other roles
+    go ahead in parallel even when they share employees; they take turns on those
+    employees only when storing their schedules (see employee_lock).
+    """
+    return ScheduleLock(lock_keys(sorted(set(roles)), first_date, last_date), timeout=timeout)
+
+
+def employee_lock(assignments, timeout=LOCK_TIMEOUT):
+    """ScheduleLock on the employees and weeks of the (employee_id, date) assignments a run is about to store."""
+    return ScheduleLock(employee_lock_keys(assignments), timeout=timeout)
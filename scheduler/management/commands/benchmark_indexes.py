@@ -0,0 +1,95 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from scheduler.models import EmployeeRole, Schedule, Shift
+from scheduler.scheduling import create_schedule
+from scheduler.synthetic import seed_restaurant
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic restaurant and show the query plans and timings of the scheduler's "
+        "hot lookups with and without the scheduling indexes and unique constraints. Everything "
+        "runs in a transaction that is rolled back, but they are dropped while it runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=300)
+        parser.add_argument('--weeks', type=int, default=4)
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per query")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            start = timezone.localdate()
+            staff = seed_restaurant(options['employees'], options['weeks'], start=start, seed=options['seed'])
+            create_schedule(start=start)
+            queries = self.hot_queries(staff, start)
+
+            with_indexes = {name: self.measure(qs, 'with indexes', options['repeat']) for name, qs in queries.items()}
+            kept = self.drop_indexes()
+            without = 'without indexes' + (f" (but with {', '.join(kept)})" if kept else '')
+            without_indexes = {name: self.measure(qs, without, options['repeat']) for name, qs in queries.items()}
+
+            for name in queries:
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                for label, (plan, elapsed) in ((without, without_indexes[name]), ('with indexes', with_indexes[name])):
+                    self.stdout.write(f"  {label}: {elapsed:.3f} ms")
+                    self.stdout.write("    " + plan.replace("\n", "\n    "))
+
+            transaction.set_rollback(True)
+
+    def hot_queries(self, staff, start):
+        employee = staff[0]
+        role = EmployeeRole.objects.filter(employee=employee).values_list('role', flat=True).first()
+        week_end = start + timedelta(days=6)
+        return {
+            'EmployeeRole by employee and role': EmployeeRole.objects.filter(employee=employee, role=role),
+            'Shifts of a role in a week': Shift.objects.filter(date__range=[start, week_end], role=role),
+            'Shifts scheduled for an employee on a day': Shift.objects.filter(date=start, schedule__employee=employee),
+            'Schedule of an employee in a week': Schedule.objects.filter(employee=employee, shift__date__range=[start, week_end]),
+            'Schedule ordered by date and shift time': Schedule.objects.order_by('shift__date', 'shift__shift_time')[:100],
+            'Open slots of a week': Shift.objects.filter(date__range=[start, week_end]).annotate(assigned=Count('schedule')),
+        }
+
+    def measure(self, queryset, label, repeat):
+        # The label comment keeps each pass from reusing statements (and, on SQLite,
+        # query plans) prepared before the indexes were dropped
+        sql, params = queryset.query.sql_with_params()
+        sql = f"{sql} /* {label} */"
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            plan = "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+
+            timings = []
+            for _ in range(repeat + 1):
+                began = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                timings.append((time.perf_counter() - began) * 1000)
+        return plan, statistics.median(timings[1:])  # The first run only warms the cache
+
+    def drop_indexes(self):
+        """
+        Drop the indexes and unique constraints of the scheduling tables, and return
+        the names of the constraints that could not be dropped in place: SQLite keeps
+        them in the table definition, which only a rebuild of the table changes.
+        """
+        kept = []
+        with connection.cursor() as cursor:
+            for model in (Shift, Schedule):
+                for index in model._meta.indexes:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+                for constraint in model._meta.constraints:
+                    if connection.vendor == 'sqlite':
+                        kept.append(constraint.name)
+                    else:
+                        table = connection.ops.quote_name(model._meta.db_table)
+                        cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {connection.ops.quote_name(constraint.name)}")
+        return kept
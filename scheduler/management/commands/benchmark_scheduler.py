@@ -0,0 +1,67 @@
+import json
+import statistics
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from scheduler.benchmark import benchmark_schedule, code_version
+from scheduler.solvers import SOLVER_CHOICES
+from scheduler.synthetic import seed_restaurant
+
+
+class Command(BaseCommand):
+    help = (
+        "Time each phase of create_schedule on a synthetic restaurant and count its SQL queries. "
+        "Every run seeds its own data in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=300)
+        parser.add_argument('--weeks', type=int, default=4)
+        parser.add_argument('--max-roles', type=int, default=2)
+        parser.add_argument('--availability', type=float, default=0.8)
+        parser.add_argument('--time-off', type=float, default=0.1)
+        parser.add_argument('--scheduled', type=float, default=0.0, help="Fraction of eligible shifts already assigned")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--workers', type=int, help="Processes used to solve independent blocks")
+        parser.add_argument('--solver', choices=[name for name, _ in SOLVER_CHOICES], help="Solver backend, picked from the problem size by default")
+        parser.add_argument('--label', help="Free-form note stored with the results")
+        parser.add_argument('--output', help="JSON file the results are appended to")
+
+    def handle(self, *args, **options):
+        dataset = {key: options[key] for key in ('employees', 'weeks', 'max_roles', 'availability', 'time_off', 'scheduled', 'seed')}
+        runs = []
+        for _ in range(options['repeat']):
+            with transaction.atomic():
+                start = timezone.localdate()
+                seed_restaurant(start=start, **dataset)
+                runs.append(benchmark_schedule(workers=options['workers'], solver=options['solver'], start=start))
+                transaction.set_rollback(True)
+
+        record = {
+            'recorded_at': timezone.now().isoformat(),
+            'version': code_version(),
+            'label': options['label'],
+            'database': connection.vendor,
+            'dataset': dataset,
+            'workers': options['workers'],
+            'solver': options['solver'],
+            'runs': runs
+        }
+
+        for phase in runs[0]['phases']:
+            seconds = statistics.median(run['phases'][phase]['seconds'] for run in runs)
+            self.stdout.write(f"{phase:<12} {seconds * 1000:10.1f} ms {runs[0]['phases'][phase]['queries']:6d} queries")
+        self.stdout.write(f"{'TOTAL':<12} {statistics.median(run['seconds'] for run in runs) * 1000:10.1f} ms {runs[0]['queries']:6d} queries")
+
+        if options['output']:
+            path = Path(options['output'])
+            history = json.loads(path.read_text()) if path.exists() else []
+            history.append(record)
+            path.write_text(json.dumps(history, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Results appended to {path}"))
+        else:
+            self.stdout.write(json.dumps(record, indent=2))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler.forms import ScheduleHorizonForm
+from scheduler.models import Role, WarmStartSource
+from scheduler.scheduling import create_schedule
+from scheduler.solvers import SOLVER_CHOICES
+
+
+class Command(BaseCommand):
+    help = "Staff the open slots of the shifts in a date window"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First date to schedule (YYYY-MM-DD), today by default")
+        parser.add_argument('--end', help="Last date to schedule (YYYY-MM-DD), open-ended by default")
+        parser.add_argument('--role', action='append', dest='roles', choices=Role.values, help="Only schedule this role; repeatable")
+        parser.add_argument('--workers', type=int, help="Processes used to solve independent blocks")
+        parser.add_argument('--solver', choices=[name for name, _ in SOLVER_CHOICES], help="Solver backend, picked from the problem size by default")
+        parser.add_argument('--warm-start', choices=WarmStartSource.values, help="Keep the still feasible assignments of an earlier schedule")
+        parser.add_argument('--time-budget', type=float, help="Seconds the anytime solver may spend improving the schedule")
+
+    def handle(self, *args, **options):
+        form = ScheduleHorizonForm({
+            'start_date': options['start'],
+            'end_date': options['end'],
+            'roles': options['roles'] or [],
+            'solver': options['solver'],
+            'time_budget': options['time_budget'],
+            'warm_start': options['warm_start'],
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+
+        total_satisfaction, unassigned_shifts = create_schedule(
+            start=form.cleaned_data['start_date'],
+            end=form.cleaned_data['end_date'],
+            roles=form.cleaned_data['roles'],
+            workers=options['workers'],
+            solver=form.cleaned_data['solver'] or None,
+            time_budget=form.cleaned_data['time_budget'],
+            warm_start=form.cleaned_data['warm_start'] or None,
+            report=lambda best: self.stdout.write(
+                f"Best so far after {best['seconds']:.1f}s: objective {best['objective']:.1f}, {best['open_slots']} open slots"
+            )
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Scheduled with total satisfaction {total_satisfaction:.1f}; {unassigned_shifts} shifts left short of staff"
+        ))
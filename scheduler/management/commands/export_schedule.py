@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler.export import csv_lines, ics_lines
+from scheduler.forms import ScheduleFilterForm
+from scheduler.models import Role, Schedule
+
+
+class Command(BaseCommand):
+    help = "Stream the schedule as CSV, or one employee's shifts as an iCalendar feed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'ics'], default='csv')
+        parser.add_argument('--start', help="First shift date to export (YYYY-MM-DD)")
+        parser.add_argument('--end', help="Last shift date to export (YYYY-MM-DD)")
+        parser.add_argument('--role', choices=Role.values, help="Only export this role")
+        parser.add_argument('--employee', type=int, help="Only export this employee id; required for ics")
+        parser.add_argument('--output', help="File to write, standard output by default")
+
+    def handle(self, *args, **options):
+        form = ScheduleFilterForm({
+            'start_date': options['start'],
+            'end_date': options['end'],
+            'role': options['role'],
+            'employee': options['employee'],
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        schedules = form.filter(Schedule.objects.all())
+
+        if options['format'] == 'ics':
+            employee = form.cleaned_data['employee']
+            if employee is None:
+                raise CommandError("--employee is required for an ics export")
+            lines = ics_lines(schedules, f'{employee.name} shifts')
+        else:
+            lines = csv_lines(schedules)
+
+        if options['output']:
+            # The lines already end in CRLF, as both formats require
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
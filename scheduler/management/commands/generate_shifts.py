@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from scheduler.shifts import generate_shifts_for_period
+
+
+class Command(BaseCommand):
+    help = "Create the missing shifts of every role and shift time over a period"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First date (YYYY-MM-DD), today by default")
+        parser.add_argument('--end', help="Last date (YYYY-MM-DD)")
+        parser.add_argument('--days', type=int, default=365, help="Length of the period when --end is not given")
+
+    def handle(self, *args, **options):
+        start_date = parse_date(options['start']) if options['start'] else timezone.localdate()
+        end_date = parse_date(options['end']) if options['end'] else start_date + timedelta(days=options['days'] - 1)
+        if not start_date or not end_date or end_date < start_date:
+            raise CommandError("Give valid dates with --end not before --start.")
+
+        created = generate_shifts_for_period(start_date, end_date)
+        self.stdout.write(self.style.SUCCESS(f"Created {created} shifts from {start_date} to {end_date}"))
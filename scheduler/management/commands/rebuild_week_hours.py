@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from scheduler.ledger import rebuild_week_hours
+
+
+class Command(BaseCommand):
+    help = "Recompute the weekly-hours ledger from the schedule"
+
+    def handle(self, *args, **options):
+        rows = rebuild_week_hours()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the weekly-hours ledger: {rows} employee weeks"))
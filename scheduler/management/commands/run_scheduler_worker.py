@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from scheduler.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "Run queued scheduling jobs in the background"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=1, help="Number of jobs to run at the same time")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to wait between queue checks")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Waiting for scheduling jobs...")
+        run_worker(threads=options['threads'], poll_interval=options['poll_interval'], once=options['once'])
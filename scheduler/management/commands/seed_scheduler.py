@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from scheduler.synthetic import seed_restaurant
+
+
+class Command(BaseCommand):
+    help = "Fill the database with a synthetic restaurant for development and benchmarking"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=300)
+        parser.add_argument('--weeks', type=int, default=4, help="Weeks of shifts to generate")
+        parser.add_argument('--start', help="First shift date (YYYY-MM-DD), today by default")
+        parser.add_argument('--max-roles', type=int, default=2, help="Most roles one employee can hold")
+        parser.add_argument('--availability', type=float, default=0.8, help="Chance that an employee is available for a weekly shift time")
+        parser.add_argument('--preferences', type=int, default=10, help="Preferred weekly shift times per employee")
+        parser.add_argument('--time-off', type=float, default=0.1, help="Chance that an employee takes up to a week off")
+        parser.add_argument('--scheduled', type=float, default=0.0, help="Fraction of eligible shifts already assigned")
+        parser.add_argument('--seed', type=int, help="Random seed, for reproducible datasets")
+
+    def handle(self, *args, **options):
+        start = parse_date(options['start']) if options['start'] else None
+        if options['start'] and not start:
+            raise CommandError("--start must be a date in YYYY-MM-DD format.")
+
+        staff = seed_restaurant(
+            employees=options['employees'],
+            weeks=options['weeks'],
+            start=start,
+            seed=options['seed'],
+            max_roles=options['max_roles'],
+            availability=options['availability'],
+            preferences=options['preferences'],
+            time_off=options['time_off'],
+            scheduled=options['scheduled']
+        )
+        self.stdout.write(self.style.SUCCESS(f"Created {len(staff)} employees and {options['weeks']} weeks of shifts"))
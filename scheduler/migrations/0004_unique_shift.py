@@ -0,0 +1,41 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:55
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_shifts(apps, schema_editor):
+    # Keep the oldest shift of each (role, date, shift_time) and move the
+    # schedules of its duplicates onto it
+    Shift = apps.get_model("scheduler", "Shift")
+    Schedule = apps.get_model("scheduler", "Schedule")
+    duplicates = (
+        Shift.objects.values("role", "date", "shift_time")
+        .annotate(keep=Min("id"), count=Count("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        others = Shift.objects.filter(
+            role=duplicate["role"],
+            date=duplicate["date"],
+            shift_time=duplicate["shift_time"],
+        ).exclude(id=duplicate["keep"])
+        Schedule.objects.filter(shift__in=others).update(shift_id=duplicate["keep"])
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scheduler", "0003_schedulingjob"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_shifts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="shift",
+            constraint=models.UniqueConstraint(
+                fields=("role", "date", "shift_time"), name="unique_shift"
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scheduler", "0004_unique_shift"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="schedule",
+            index=models.Index(
+                fields=["employee", "shift"], name="schedule_employee_shift_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="shift",
+            index=models.Index(
+                fields=["date", "role", "shift_time"], name="shift_date_role_time_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,153 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.dateparse import parse_date
+
+SHIFT_TIMES = [
+    "MORNING",
+    "AFTERNOON",
+    "EVENING",
+    "NIGHT",
+    "LATE_NIGHT",
+    "EARLY_MORNING",
+]
+
+
+def parse_dates(values):
+    for value in values:
+        try:
+            date = parse_date(str(value))
+        except ValueError:
+            date = None
+        if date:
+            yield date
+
+
+def convert_availability(apps, schema_editor):
+    # Dates listed in `availability` become AVAILABLE exceptions, one per run of
+    # consecutive days, and shift ids in `preferred_shifts` PREFERRED exceptions
+    # for their date and shift time. The weekly masks start empty, as employees
+    # used to be unavailable on any date they had not listed.
+    Employee = apps.get_model("scheduler", "Employee")
+    Shift = apps.get_model("scheduler", "Shift")
+    AvailabilityException = apps.get_model("scheduler", "AvailabilityException")
+    all_times = (1 << len(SHIFT_TIMES)) - 1
+
+    exceptions = []
+    preferred = {}
+    for employee in Employee.objects.all():
+        runs = []
+        for date in sorted(set(parse_dates(employee.availability or ()))):
+            if runs and (date - runs[-1][1]).days == 1:
+                runs[-1][1] = date
+            else:
+                runs.append([date, date])
+        exceptions += [
+            AvailabilityException(
+                employee=employee,
+                start_date=first,
+                end_date=last,
+                shift_times=all_times,
+                kind="AVAILABLE",
+            )
+            for first, last in runs
+        ]
+        shift_ids = [
+            value
+            for value in (employee.preferred_shifts or ())
+            if isinstance(value, int)
+        ]
+        if shift_ids:
+            preferred[employee] = shift_ids
+
+    shifts = Shift.objects.filter(
+        id__in={shift_id for ids in preferred.values() for shift_id in ids}
+    ).in_bulk()
+    exceptions += [
+        AvailabilityException(
+            employee=employee,
+            start_date=shifts[shift_id].date,
+            end_date=shifts[shift_id].date,
+            shift_times=1 << SHIFT_TIMES.index(shifts[shift_id].shift_time),
+            kind="PREFERRED",
+        )
+        for employee, shift_ids in preferred.items()
+        for shift_id in shift_ids
+        if shift_id in shifts
+    ]
+    AvailabilityException.objects.bulk_create(exceptions, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scheduler", "0005_scheduling_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="employee",
+            name="availability_mask",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="employee",
+            name="preference_mask",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="AvailabilityException",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("start_date", models.DateField()),
+                ("end_date", models.DateField()),
+                ("shift_times", models.PositiveSmallIntegerField(default=63)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("AVAILABLE", "Available"),
+                            ("UNAVAILABLE", "Unavailable"),
+                            ("PREFERRED", "Preferred"),
+                        ],
+                        default="UNAVAILABLE",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "employee",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="availability_exceptions",
+                        to="scheduler.employee",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["employee", "end_date"],
+                        name="exception_employee_end_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(convert_availability, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="employee",
+            name="availability",
+        ),
+        migrations.RemoveField(
+            model_name="employee",
+            name="preferred_shifts",
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scheduler", "0006_availability_masks"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="schedulingresult",
+            name="employee_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="schedulingresult",
+            name="feasible_pairs",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="schedulingresult",
+            name="objective",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="schedulingresult",
+            name="peak_memory",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="schedulingresult",
+            name="phases",
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name="schedulingresult",
+            name="query_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="schedulingresult",
+            name="shift_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="schedulingresult",
+            name="solver_backend",
+            field=models.CharField(blank=True, max_length=50),
+        ),
+    ]
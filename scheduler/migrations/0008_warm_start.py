@@ -0,0 +1,30 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scheduler", "0007_scheduling_result_telemetry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="schedule",
+            name="result",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="schedules",
+                to="scheduler.schedulingresult",
+            ),
+        ),
+        migrations.AddField(
+            model_name="schedulingresult",
+            name="seeded_assignments",
+            field=models.IntegerField(default=0),
+        ),
+    ]
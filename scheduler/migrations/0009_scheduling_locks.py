@@ -0,0 +1,40 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scheduler", "0008_warm_start"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SchedulingLock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=100, unique=True)),
+                ("owner", models.CharField(max_length=32)),
+                ("expires_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="schedulingresult",
+            name="lock_hold",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="schedulingresult",
+            name="lock_wait",
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, IntegerField, Sum, When
+from django.db.models.functions import TruncWeek
+
+# Length in minutes of each shift time
+SHIFT_MINUTES = {
+    "MORNING": 540,
+    "AFTERNOON": 540,
+    "EVENING": 540,
+    "NIGHT": 540,
+    "LATE_NIGHT": 540,
+    "EARLY_MORNING": 540,
+}
+
+
+def fill_ledger(apps, schema_editor):
+    # Every scheduled shift counts in the ISO week it starts
+    Schedule = apps.get_model("scheduler", "Schedule")
+    EmployeeWeekHours = apps.get_model("scheduler", "EmployeeWeekHours")
+    minutes = Sum(
+        Case(
+            *[
+                When(shift__shift_time=shift_time, then=length)
+                for shift_time, length in SHIFT_MINUTES.items()
+            ],
+            output_field=IntegerField(),
+        )
+    )
+    totals = (
+        Schedule.objects.values("employee_id", week=TruncWeek("shift__date"))
+        .annotate(minutes=minutes)
+        .order_by()
+    )
+    EmployeeWeekHours.objects.bulk_create(
+        [
+            EmployeeWeekHours(
+                employee_id=row["employee_id"], week=row["week"], minutes=row["minutes"]
+            )
+            for row in totals.iterator()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scheduler", "0009_scheduling_locks"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmployeeWeekHours",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("week", models.DateField(help_text="Monday of the ISO week")),
+                ("minutes", models.IntegerField(default=0)),
+                (
+                    "employee",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="week_hours",
+                        to="scheduler.employee",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["week", "minutes"], name="week_hours_week_minutes_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("employee", "week"), name="unique_employee_week"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_ledger, migrations.RunPython.noop),
+    ]
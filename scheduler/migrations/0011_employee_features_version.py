@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scheduler", "0010_employee_week_hours"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="employee",
+            name="features_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
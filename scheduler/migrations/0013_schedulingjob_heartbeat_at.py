@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scheduler", "0012_schedule_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="schedulingjob",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:05
+
+import secrets
+
+from django.db import migrations, models
+
+import scheduler.models
+
+
+def fill_tokens(apps, schema_editor):
+    # Every employee needs a distinct token before the column can be made unique
+    Employee = apps.get_model("scheduler", "Employee")
+    employees = list(Employee.objects.only("pk"))
+    for employee in employees:
+        employee.calendar_token = secrets.token_urlsafe(32)
+    Employee.objects.bulk_update(employees, ["calendar_token"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scheduler", "0013_schedulingjob_heartbeat_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="employee",
+            name="calendar_token",
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_tokens, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="employee",
+            name="calendar_token",
+            field=models.CharField(
+                default=scheduler.models.new_calendar_token,
+                editable=False,
+                max_length=64,
+                unique=True,
+            ),
+        ),
+    ]
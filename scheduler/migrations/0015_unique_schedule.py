@@ -0,0 +1,82 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:08
+
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, Min, Sum, When
+from django.db.models.functions import TruncWeek
+
+# Length in minutes of each shift time
+SHIFT_MINUTES = {
+    "MORNING": 540,
+    "AFTERNOON": 540,
+    "EVENING": 540,
+    "NIGHT": 540,
+    "LATE_NIGHT": 540,
+    "EARLY_MORNING": 540,
+}
+
+
+def delete_duplicate_schedules(apps, schema_editor):
+    # Keep the oldest row of each (employee, shift) and recount the weekly-hours
+    # ledger of the employees whose duplicates went, as it counted every row
+    Schedule = apps.get_model("scheduler", "Schedule")
+    EmployeeWeekHours = apps.get_model("scheduler", "EmployeeWeekHours")
+    duplicates = (
+        Schedule.objects.values("employee_id", "shift_id")
+        .annotate(keep=Min("id"), count=Count("id"))
+        .filter(count__gt=1)
+    )
+    employee_ids = set()
+    for duplicate in duplicates:
+        Schedule.objects.filter(
+            employee_id=duplicate["employee_id"], shift_id=duplicate["shift_id"]
+        ).exclude(id=duplicate["keep"]).delete()
+        employee_ids.add(duplicate["employee_id"])
+    if not employee_ids:
+        return
+
+    minutes = Sum(
+        Case(
+            *[
+                When(shift__shift_time=shift_time, then=length)
+                for shift_time, length in SHIFT_MINUTES.items()
+            ],
+            output_field=IntegerField(),
+        )
+    )
+    totals = (
+        Schedule.objects.filter(employee_id__in=employee_ids)
+        .values("employee_id", week=TruncWeek("shift__date"))
+        .annotate(minutes=minutes)
+        .order_by()
+    )
+    EmployeeWeekHours.objects.filter(employee_id__in=employee_ids).delete()
+    EmployeeWeekHours.objects.bulk_create(
+        [
+            EmployeeWeekHours(
+                employee_id=row["employee_id"], week=row["week"], minutes=row["minutes"]
+            )
+            for row in totals.iterator()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scheduler", "0014_employee_calendar_token"),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_schedules, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="schedule",
+            name="schedule_employee_shift_idx",
+        ),
+        migrations.AddConstraint(
+            model_name="schedule",
+            constraint=models.UniqueConstraint(
+                fields=("employee", "shift"), name="unique_schedule"
+            ),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_features_versions(apps, schema_editor):
+    # Only the employees whose roles or exceptions ever changed need a row
+    Employee = apps.get_model("scheduler", "Employee")
+    EmployeeFeaturesVersion = apps.get_model("scheduler", "EmployeeFeaturesVersion")
+    EmployeeFeaturesVersion.objects.bulk_create(
+        [
+            EmployeeFeaturesVersion(employee_id=employee_id, version=version)
+            for employee_id, version in Employee.objects.filter(
+                features_version__gt=0
+            ).values_list("id", "features_version")
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scheduler", "0015_unique_schedule"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmployeeFeaturesVersion",
+            fields=[
+                (
+                    "employee",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="+",
+                        serialize=False,
+                        to="scheduler.employee",
+                    ),
+                ),
+                ("version", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(copy_features_versions, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="employee",
+            name="features_version",
+        ),
+    ]
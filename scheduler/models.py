@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+from datetime import datetime, time, timedelta
+import secrets
 
 class EmployeeType(models.TextChoices):
     CREW = 'CREW', 'Crew'
@@ -40,23 +42,94 @@ class ShiftTime(models.TextChoices):
     LATE_NIGHT = 'LATE_NIGHT', '9PM to 6AM'
     EARLY_MORNING = 'EARLY_MORNING', '12AM to 9AM'
 
+# Start of each shift time in minutes after midnight of the shift's date, and its length in minutes
+SHIFT_TIMES = {
+    ShiftTime.MORNING: (9 * 60, 9 * 60),
+    ShiftTime.AFTERNOON: (12 * 60, 9 * 60),
+    ShiftTime.EVENING: (15 * 60, 9 * 60),
+    ShiftTime.NIGHT: (18 * 60, 9 * 60),
+    ShiftTime.LATE_NIGHT: (21 * 60, 9 * 60),
+    ShiftTime.EARLY_MORNING: (0, 9 * 60),
+}
+
+# Wall-clock start and end of each shift time; overnight shifts end before they start
+SHIFT_CLOCK_TIMES = {
+    shift_time: (time(start // 60 % 24, start % 60), time((start + duration) // 60 % 24, (start + duration) % 60))
+    for shift_time, (start, duration) in SHIFT_TIMES.items()
+}
+
+# Employees' weekly availability and preferences are bitmasks with one bit per weekday and
+# shift time: bit `weekday * 6 + code`, where `code` is the shift time's position in ShiftTime
+SHIFT_TIME_CODES = {shift_time: code for code, shift_time in enumerate(ShiftTime.values)}
+ALL_SHIFT_TIMES = (1 << len(SHIFT_TIME_CODES)) - 1
+
+def new_calendar_token():
+    return secrets.token_urlsafe(32)
+
+
+def weekly_bit(weekday, shift_time):
+    return 1 << (weekday * len(SHIFT_TIME_CODES) + SHIFT_TIME_CODES[shift_time])
+
+class ExceptionKind(models.TextChoices):
+    AVAILABLE = 'AVAILABLE', 'Available'
+    UNAVAILABLE = 'UNAVAILABLE', 'Unavailable'
+    PREFERRED = 'PREFERRED', 'Preferred'
+
+class JobStatus(models.TextChoices):
+    PENDING = 'PENDING', 'Pending'
+    RUNNING = 'RUNNING', 'Running'
+    SUCCEEDED = 'SUCCEEDED', 'Succeeded'
+    FAILED = 'FAILED', 'Failed'
+
+class SchedulingPhase(models.TextChoices):
+    LOADING = 'LOADING', 'Loading'
+    COST_MATRIX = 'COST_MATRIX', 'Cost matrix'
+    SOLVE = 'SOLVE', 'Solve'
+    PERSIST = 'PERSIST', 'Persist'
+
+class WarmStartSource(models.TextChoices):
+    SCHEDULE = 'schedule', "Previous week's schedule"
+    LAST_RUN = 'last_run', 'Last scheduling run'
+
 class Employee(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True)
     name = models.CharField(max_length=100)
     max_hours_per_week = models.IntegerField(default=48, validators=[MinValueValidator(0), MaxValueValidator(168)])
-    availability = models.JSONField(default=dict)
-    preferred_shifts = models.JSONField(default=dict)
+    availability_mask = models.BigIntegerField(default=0)
+    preference_mask = models.BigIntegerField(default=0)
     satisfaction_score = models.FloatField(default=0, validators=[MinValueValidator(0), MaxValueValidator(100)])
+    # Secret in the URL of the employee's calendar feed, which calendar apps fetch
+    # without logging in; replacing it revokes every existing subscription
+    calendar_token = models.CharField(max_length=64, unique=True, default=new_calendar_token, editable=False)
 
     def __str__(self):
         return self.name
 
+    def is_available(self, date, shift_time):
+        available = bool(self.availability_mask & weekly_bit(date.weekday(), shift_time))
+        for exception in self.exceptions_on(date, shift_time):
+            if exception.kind != ExceptionKind.PREFERRED:
+                available = exception.kind == ExceptionKind.AVAILABLE
+        return available
+
+    def prefers(self, date, shift_time):
+        return bool(self.preference_mask & weekly_bit(date.weekday(), shift_time)) or any(
+            exception.kind == ExceptionKind.PREFERRED for exception in self.exceptions_on(date, shift_time)
+        )
+
+    def exceptions_on(self, date, shift_time):
+        # Later exceptions override earlier ones
+        bit = 1 << SHIFT_TIME_CODES[shift_time]
+        exceptions = self.availability_exceptions.filter(start_date__lte=date, end_date__gte=date).order_by('id')
+        return [exception for exception in exceptions if exception.shift_times & bit]
+
     @property
     def employee_type(self):
+        # Taken from the first role added; works from prefetched roles without a query
         roles = self.roles.all()
         if not roles:
             return None
-        return Role.get_type(roles.first().role)
+        return Role.get_type(min(roles, key=lambda role: role.pk).role)
 
 class EmployeeRole(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='roles')
@@ -70,11 +143,38 @@ class EmployeeRole(models.Model):
     def __str__(self):
         return f"{self.employee.name} - {self.get_role_display()} ({self.rating} Stars)"
 
+class AvailabilityException(models.Model):
+    """
+    Overrides an employee's weekly masks from `start_date` to `end_date`, inclusive, for
+    the shift times whose bits are set in `shift_times` (bit `code` per ShiftTime).
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='availability_exceptions')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    shift_times = models.PositiveSmallIntegerField(default=ALL_SHIFT_TIMES)
+    kind = models.CharField(max_length=20, choices=ExceptionKind.choices, default=ExceptionKind.UNAVAILABLE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'end_date'], name='exception_employee_end_idx')
+        ]
+
+    def __str__(self):
+        return f"{self.employee.name} - {self.get_kind_display()} {self.start_date} to {self.end_date}"
+
 class Shift(models.Model):
     role = models.CharField(max_length=50, choices=Role.choices)
     date = models.DateField()
     shift_time = models.CharField(max_length=20, choices=ShiftTime.choices, default=ShiftTime.MORNING)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['role', 'date', 'shift_time'], name='unique_shift')
+        ]
+        indexes = [
+            models.Index(fields=['date', 'role', 'shift_time'], name='shift_date_role_time_idx')
+        ]
+
     def __str__(self):
         return f"{self.get_role_display()} - {self.date} ({self.get_shift_time_display()})"
 
@@ -86,29 +186,184 @@ class Shift(models.Model):
     def end_time(self):
         return self.get_shift_times()[1]
 
+    @property
+    def start_datetime(self):
+        return timezone.make_aware(self.get_shift_datetimes()[0])
+
+    @property
+    def end_datetime(self):
+        return timezone.make_aware(self.get_shift_datetimes()[1])
+
     def get_shift_times(self):
-        shift_times = {
-            ShiftTime.MORNING: (timezone.time(9, 0), timezone.time(18, 0)),
-            ShiftTime.AFTERNOON: (timezone.time(12, 0), timezone.time(21, 0)),
-            ShiftTime.EVENING: (timezone.time(15, 0), timezone.time(0, 0)),
-            ShiftTime.NIGHT: (timezone.time(18, 0), timezone.time(3, 0)),
-            ShiftTime.LATE_NIGHT: (timezone.time(21, 0), timezone.time(6, 0)),
-            ShiftTime.EARLY_MORNING: (timezone.time(0, 0), timezone.time(9, 0)),
-        }
-        return shift_times[self.shift_time]
+        return SHIFT_CLOCK_TIMES[self.shift_time]
+
+    def get_shift_datetimes(self):
+        # Overnight shifts end on the following day
+        start, duration = SHIFT_TIMES[self.shift_time]
+        start_datetime = datetime.combine(self.date, time()) + timedelta(minutes=start)
+        return start_datetime, start_datetime + timedelta(minutes=duration)
+
+class ScheduleQuerySet(models.QuerySet):
+    def listing(self):
+        """Assignments in shift order, with their employee and shift loaded in the same query."""
+        return self.select_related('employee', 'shift').order_by('shift__date', 'shift__shift_time', 'pk')
+
+    def after(self, date, shift_time, pk):
+        """The assignments following the (shift date, shift time, id) position in listing() order, for keyset pagination."""
+        return self.filter(
+            models.Q(shift__date__gt=date)
+            | models.Q(shift__date=date, shift__shift_time__gt=shift_time)
+            | models.Q(shift__date=date, shift__shift_time=shift_time, pk__gt=pk)
+        )
 
 class Schedule(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
     shift = models.ForeignKey(Shift, on_delete=models.CASCADE)
     date = models.DateTimeField(auto_now_add=True)
+    # The latest scheduling run whose schedule includes the assignment, if any
+    result = models.ForeignKey('SchedulingResult', on_delete=models.SET_NULL, null=True, blank=True, related_name='schedules')
+
+    objects = ScheduleQuerySet.as_manager()
+
+    class Meta:
+        # Also the index for looking up an employee's assignments
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'shift'], name='unique_schedule')
+        ]
 
     def __str__(self):
         return f"{self.employee.name} - {self.shift}"
 
+class ScheduleVersionQuerySet(models.QuerySet):
+    def bump(self):
+        """Count a write to the schedule, in the writer's transaction."""
+        now = timezone.now()
+        if not self.filter(pk=1).update(version=models.F('version') + 1, updated_at=now):
+            # The first write creates the row; if a concurrent one got there first, count again
+            _, created = self.get_or_create(pk=1, defaults={'version': 1, 'updated_at': now})
+            if not created:
+                self.bump()
+
+    def current(self):
+        """The (version, updated_at) of the schedule, (0, None) before its first write."""
+        return self.filter(pk=1).values_list('version', 'updated_at').first() or (0, None)
+
+class ScheduleVersion(models.Model):
+    """
+    Single row counting the writes to the schedule and to the shifts and employees it
+    shows, with the time of the latest one. The signal receivers and the bulk write
+    paths bump it; the schedule views derive their ETag and Last-Modified from it.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(null=True)
+
+    objects = ScheduleVersionQuerySet.as_manager()
+
+class EmployeeFeaturesVersionQuerySet(models.QuerySet):
+    def bump(self, employee_id):
+        """Count a change to the employee's roles or exceptions, in the writer's transaction."""
+        if not self.filter(employee_id=employee_id).update(version=models.F('version') + 1):
+            # The first change creates the row; if a concurrent one got there first, count again
+            _, created = self.get_or_create(employee_id=employee_id, defaults={'version': 1})
+            if not created:
+                self.bump(employee_id)
+
+    def current(self, employee_ids):
+        """The version of each of `employee_ids`, 0 before the first change."""
+        versions = dict(self.filter(employee_id__in=employee_ids).values_list('employee_id', 'version'))
+        return {employee_id: versions.get(employee_id, 0) for employee_id in employee_ids}
+
+class EmployeeFeaturesVersion(models.Model):
+    """
+    Count of the changes to an employee's roles and availability exceptions, which
+    cached feature vectors are checked against (see caching.employee_features). Kept
+    apart from Employee, so saving an employee never writes it.
+    """
+    employee = models.OneToOneField(Employee, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    version = models.PositiveBigIntegerField(default=0)
+
+    objects = EmployeeFeaturesVersionQuerySet.as_manager()
+
+class EmployeeWeekHours(models.Model):
+    """
+    Minutes an employee is scheduled for in one ISO week, counting each shift in the
+    week it starts. Kept in step with Schedule by the signal receivers and the bulk
+    persistence path (see ledger.py).
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='week_hours')
+    week = models.DateField(help_text="Monday of the ISO week")
+    minutes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'week'], name='unique_employee_week')
+        ]
+        indexes = [
+            models.Index(fields=['week', 'minutes'], name='week_hours_week_minutes_idx')
+        ]
+
+    def __str__(self):
+        return f"{self.employee.name} - week of {self.week}: {self.hours:g}h"
+
+    @property
+    def hours(self):
+        return self.minutes / 60
+
 class SchedulingResult(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     total_satisfaction = models.FloatField()
     unassigned_shifts = models.IntegerField()
+    employee_count = models.IntegerField(default=0)
+    shift_count = models.IntegerField(default=0)
+    feasible_pairs = models.IntegerField(default=0)
+    objective = models.FloatField(null=True, blank=True)
+    # Seconds, database seconds and queries of each SchedulingPhase
+    phases = models.JSONField(default=dict)
+    query_count = models.IntegerField(default=0)
+    # Highest resident memory of the process during the run, in bytes
+    peak_memory = models.BigIntegerField(null=True, blank=True)
+    solver_backend = models.CharField(max_length=50, blank=True)
+    seeded_assignments = models.IntegerField(default=0)
+    # Seconds spent waiting for, then holding, the locks on the run's roles and weeks
+    lock_wait = models.FloatField(default=0)
+    lock_hold = models.FloatField(default=0)
 
     def __str__(self):
         return f"Scheduling Result {self.created_at}"
+
+    @property
+    def seconds(self):
+        return sum(phase['seconds'] for phase in self.phases.values())
+
+    def phase_seconds(self, phase):
+        return self.phases.get(phase, {}).get('seconds', 0)
+
+class SchedulingLock(models.Model):
+    """A held scheduling lock, where PostgreSQL advisory locks are not available."""
+    key = models.CharField(max_length=100, unique=True)
+    owner = models.CharField(max_length=32)
+    # Locks of a run that died without releasing them are taken over once expired
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.key
+
+class SchedulingJob(models.Model):
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=JobStatus.choices, default=JobStatus.PENDING)
+    phase = models.CharField(max_length=20, choices=SchedulingPhase.choices, blank=True)
+    progress = models.FloatField(default=0, validators=[MinValueValidator(0), MaxValueValidator(1)])
+    parameters = models.JSONField(default=dict)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker running the job, so jobs of a dead worker can be told apart
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"Scheduling Job {self.pk} ({self.get_status_display()})"
@@ -0,0 +1,113 @@
+import io
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .caching import forget_shifts
+from .ledger import apply_week_deltas, assignment_deltas
+from .models import Schedule, ScheduleVersion
+
+# Rows per statement when writing without COPY, below SQLite's limit on query parameters
+PERSIST_BATCH_SIZE = 500
+
+
+def replace_schedules(shift_ids, pairs, result=None):
+    """
+    Make the (employee_id, shift_id) `pairs` the whole schedule of the shifts in
+    `shift_ids`, in one transaction, so readers see either the old schedule or the
+    new one. Assignments in both are kept, the others are deleted, and new ones are
+    created; all of them are then marked as part of `result`, if given. The
+    weekly-hours ledger is updated in the same transaction. Returns the numbers of
+    deleted and created rows.
+
+    PostgreSQL stages the data with COPY and applies it with two set-based
+    statements; other backends compare in Python and write in batches.
+    """
+    shift_ids = sorted(set(shift_ids))
+    pairs = sorted(set(pairs))
+    with transaction.atomic():
+        transaction.on_commit(lambda: forget_shifts(shift_ids))
+        if connection.vendor == 'postgresql':
+            removed, added = _replace_with_copy(shift_ids, pairs, result)
+        else:
+            removed, added = _replace_in_batches(shift_ids, pairs, result)
+        # Bulk writes send no signals, so the cache, the ledger and the schedule version are updated here
+        apply_week_deltas(assignment_deltas(added=added, removed=removed))
+        if removed or added:
+            ScheduleVersion.objects.bump()
+        return len(removed), len(added)
+
+
+def _copy(cursor, table, rows):
+    data = io.StringIO(''.join('\t'.join(map(str, row)) + '\n' for row in rows))
+    if hasattr(cursor, 'copy_expert'):  # psycopg2
+        cursor.copy_expert(f'COPY {table} FROM STDIN', data)
+    else:  # psycopg 3
+        with cursor.copy(f'COPY {table} FROM STDIN') as copy:
+            copy.write(data.getvalue())
+
+
+def _replace_with_copy(shift_ids, pairs, result):
+    table = connection.ops.quote_name(Schedule._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE TEMPORARY TABLE schedule_horizon (shift_id bigint PRIMARY KEY) ON COMMIT DROP')
+        cursor.execute(
+            'CREATE TEMPORARY TABLE schedule_staging (employee_id bigint, shift_id bigint, PRIMARY KEY (shift_id, employee_id)) '
+            'ON COMMIT DROP'
+        )
+        _copy(cursor, 'schedule_horizon', ((shift_id,) for shift_id in shift_ids))
+        _copy(cursor, 'schedule_staging', pairs)
+        cursor.execute('ANALYZE schedule_horizon')
+        cursor.execute('ANALYZE schedule_staging')
+
+        cursor.execute(
+            f'DELETE FROM {table} AS s USING schedule_horizon AS h '
+            f'WHERE s.shift_id = h.shift_id AND NOT EXISTS ('
+            f'SELECT 1 FROM schedule_staging AS n WHERE n.shift_id = s.shift_id AND n.employee_id = s.employee_id) '
+            f'RETURNING s.employee_id, s.shift_id'
+        )
+        removed = cursor.fetchall()
+        cursor.execute(
+            f'INSERT INTO {table} (employee_id, shift_id, result_id, date) '
+            f'SELECT n.employee_id, n.shift_id, %s, %s FROM schedule_staging AS n '
+            f'WHERE NOT EXISTS (SELECT 1 FROM {table} AS s WHERE s.shift_id = n.shift_id AND s.employee_id = n.employee_id) '
+            f'RETURNING employee_id, shift_id',
+            [result.pk if result else None, timezone.now()]
+        )
+        added = cursor.fetchall()
+        if result:
+            cursor.execute(
+                f'UPDATE {table} AS s SET result_id = %s FROM schedule_staging AS n '
+                f'WHERE s.shift_id = n.shift_id AND s.employee_id = n.employee_id',
+                [result.pk]
+            )
+        # Dropped now rather than on commit, in case the caller's transaction goes on
+        cursor.execute('DROP TABLE schedule_horizon, schedule_staging')
+        return removed, added
+
+
+def _replace_in_batches(shift_ids, pairs, result):
+    wanted = set(pairs)
+    stale, removed, present, present_ids = [], [], set(), []
+    for start in range(0, len(shift_ids), PERSIST_BATCH_SIZE):
+        batch = shift_ids[start:start + PERSIST_BATCH_SIZE]
+        for pk, employee_id, shift_id in Schedule.objects.filter(shift_id__in=batch).values_list('pk', 'employee_id', 'shift_id'):
+            if (employee_id, shift_id) in wanted:
+                present.add((employee_id, shift_id))
+                present_ids.append(pk)
+            else:
+                stale.append(pk)
+                removed.append((employee_id, shift_id))
+
+    # Plain DELETE statements, as QuerySet.delete() would send a signal per row
+    table = connection.ops.quote_name(Schedule._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(stale), PERSIST_BATCH_SIZE):
+            batch = stale[start:start + PERSIST_BATCH_SIZE]
+            cursor.execute(f'DELETE FROM {table} WHERE id IN ({", ".join(["%s"] * len(batch))})', batch)
+    if result:
+        for start in range(0, len(present_ids), PERSIST_BATCH_SIZE):
+            Schedule.objects.filter(pk__in=present_ids[start:start + PERSIST_BATCH_SIZE]).update(result=result)
+    added = [(e, s) for e, s in pairs if (e, s) not in present]
+    Schedule.objects.bulk_create([Schedule(employee_id=e, shift_id=s, result=result) for e, s in added], batch_size=PERSIST_BATCH_SIZE)
+    return removed, added
@@ -1,8 +1,67 @@
-from scipy.optimize import linear_sum_assignment
 import numpy as np
-from django.db.models import Sum, F
-from datetime import timedelta
-from .models import Employee, Shift, Schedule, SchedulingResult, EmployeeRole, EmployeeType, Role, ShiftTime
+from collections import Counter
+from datetime import datetime, timedelta
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+from .caching import employee_features, shift_descriptors
+from .costs import CostModel, MIN_REST_MINUTES, REST_GAP_PENALTY
+from .instrumentation import PhaseRecorder
+from .ledger import week_minutes
+from .locking import employee_lock, horizon_lock
+from .persistence import replace_schedules
+from .solvers import solve
+from .timeline import Timeline, MINUTES_PER_DAY, MINUTES_PER_WEEK
+from .models import (
+    Employee, Shift, Schedule, ScheduleVersion, SchedulingResult, EmployeeRole, EmployeeWeekHours, EmployeeType, Role, ShiftTime,
+    SchedulingPhase, ExceptionKind, WarmStartSource, SHIFT_TIMES, SHIFT_TIME_CODES
+)
+
+# Days ahead, from today, over which a changed employee's assignments are re-solved
+RESCHEDULE_DAYS = 28
+
+# SHIFT_TIMES as arrays indexed by the position of the shift time in ShiftTime.values
+SHIFT_START_MINUTES = np.array([SHIFT_TIMES[shift_time][0] for shift_time in ShiftTime.values], dtype=np.int64)
+SHIFT_DURATION_MINUTES = np.array([SHIFT_TIMES[shift_time][1] for shift_time in ShiftTime.values], dtype=np.int64)
+
+def shift_intervals(dates, shift_times, origin):
+    """Start and end minutes after midnight of `origin` for parallel sequences of shift dates and shift times."""
+    days = (np.array(dates, dtype='datetime64[D]') - np.datetime64(origin, 'D')).astype(np.int64)
+    codes = np.array([SHIFT_TIME_CODES[shift_time] for shift_time in shift_times], dtype=np.int64)
+    start = days * MINUTES_PER_DAY + SHIFT_START_MINUTES[codes]
+    return start, start + SHIFT_DURATION_MINUTES[codes]
+
+def decode_weekly_masks(masks):
+    """Weekly availability or preference masks as an employees x weekdays x shift times boolean array."""
+    masks = np.array(masks, dtype=np.int64).reshape(-1, 1)
+    bits = (masks >> np.arange(7 * len(SHIFT_TIME_CODES))) & 1
+    return bits.astype(bool).reshape(len(masks), 7, len(SHIFT_TIME_CODES))
+
+def availability_masks(features, dates):
+    """
+    Whether each employee is available for, and prefers, each shift time of the given
+    sorted dates, as two employees x dates x shift times boolean arrays, from the
+    employees' feature vectors (see caching.employee_features). The weekly masks are
+    decoded in one step, then the exceptions overlapping the dates are applied in the
+    order they were created.
+    """
+    weekdays = [d.weekday() for d in dates]
+    available = decode_weekly_masks([f['availability_mask'] for f in features])[:, weekdays]
+    preferred = decode_weekly_masks([f['preference_mask'] for f in features])[:, weekdays]
+    if not dates:
+        return available, preferred
+
+    days = np.array(dates, dtype='datetime64[D]')
+    for row, employee in enumerate(features):
+        for start_date, end_date, shift_times, kind in employee['exceptions']:
+            if start_date > dates[-1] or end_date < dates[0]:
+                continue
+            first = np.searchsorted(days, np.datetime64(start_date, 'D'), side='left')
+            last = np.searchsorted(days, np.datetime64(end_date, 'D'), side='right')
+            times = (shift_times >> np.arange(len(SHIFT_TIME_CODES))) & 1 == 1
+            mask = preferred if kind == ExceptionKind.PREFERRED else available
+            mask[row, first:last, times] = kind != ExceptionKind.UNAVAILABLE
+    return available, preferred
 
 def is_peak_hour(shift):
     peak_hours = [ShiftTime.MORNING, ShiftTime.AFTERNOON, ShiftTime.EVENING]
@@ -35,80 +94,375 @@ def calculate_cost(employee, shift):
     # Adjust cost based on role rating
     cost -= role_rating * 10
 
-    if shift.date.isoformat() not in employee.availability:
+    if not employee.is_available(shift.date, shift.shift_time):
         return float('inf')  # Employee not available
 
     # Preferred shift bonus
-    if shift.id in employee.preferred_shifts:
+    if employee.prefers(shift.date, shift.shift_time):
         cost -= 20
 
     # Consider employee satisfaction
     cost -= employee.satisfaction_score * 0.5
 
+    shift_start, shift_end = shift.get_shift_datetimes()
+
     # Consider consecutive shifts
-    previous_shift = Shift.objects.filter(date=shift.date - timedelta(days=1), employee=employee).first()
-    if previous_shift:
-        hours_between = (shift.start_time - previous_shift.end_time).total_seconds() / 3600
+    previous_shifts = Shift.objects.filter(date=shift.date - timedelta(days=1), schedule__employee=employee)
+    if previous_shifts:
+        previous_end = max(s.get_shift_datetimes()[1] for s in previous_shifts)
+        hours_between = (shift_start - previous_end).total_seconds() / 3600
         if hours_between < 12:
             cost += 30  # Penalty for less than 12 hours between shifts
 
-    # Consider weekly hours limit
+    # Consider weekly hours limit, as kept in the weekly-hours ledger
     week_start = shift.date - timedelta(days=shift.date.weekday())
-    week_end = week_start + timedelta(days=6)
-    weekly_hours = Schedule.objects.filter(
-        employee=employee,
-        shift__date__range=[week_start, week_end]
-    ).aggregate(total_hours=Sum(F('shift__end_time') - F('shift__start_time')))['total_hours'] or timedelta()
-    weekly_hours = weekly_hours.total_seconds() / 3600
-
-    if weekly_hours + (shift.end_time - shift.start_time).total_seconds() / 3600 > employee.max_hours_per_week:
+    weekly_minutes = EmployeeWeekHours.objects.filter(employee=employee, week=week_start).values_list('minutes', flat=True).first()
+    weekly_hours = (weekly_minutes or 0) / 60
+
+    if weekly_hours + (shift_end - shift_start).total_seconds() / 3600 > employee.max_hours_per_week:
         cost += 50  # Penalty for exceeding weekly hours limit
 
     return max(cost, 0)  # Ensure non-negative cost
 
-def create_schedule():
-    employees = Employee.objects.all()
-    shifts = Shift.objects.all()
-
-    cost_matrix = np.array([[calculate_cost(e, s) for s in shifts] for e in employees])
-
-    row_ind, col_ind = linear_sum_assignment(cost_matrix)
-
-    # Create schedule entries
-    schedules = []
-    for r, c in zip(row_ind, col_ind):
-        if cost_matrix[r, c] < float('inf'):
-            schedules.append(Schedule(employee=employees[r], shift=shifts[c]))
-
-    # Check constraints
-    for shift in shifts:
-        required_staff = get_required_staff(shift)
-        assigned_staff = sum(1 for s in schedules if s.shift == shift)
-        
-        # Adjust assignments if constraints are not met
-        while assigned_staff < required_staff:
-            # Find an available employee with the required role
-            available_employee = next(
-                (e for e in employees if EmployeeRole.objects.filter(employee=e, role=shift.role).exists() and calculate_cost(e, shift) < float('inf')),
-                None
-            )
-            if available_employee:
-                schedules.append(Schedule(employee=available_employee, shift=shift))
-                assigned_staff += 1
-            else:
-                break  # No available employee found, constraint cannot be met
+def build_cost_model(employees, shifts, kept=None):
+    """
+    CostModel of `employees` against `shifts`, with the schedule around them in its
+    timeline. With `kept`, only those (employee_id, shift_id) assignments of the
+    shifts stay in it; their other assignments are left out, as they are about to be
+    replaced.
+    """
+    employees = list(employees)
+    shifts = list(shifts)
+    employee_index = {e.id: i for i, e in enumerate(employees)}
+
+    # Days are counted from the Monday on or before the day preceding the first shift,
+    # so the rest-gap lookup for the earliest shift still has a previous day
+    dates = [s.date for s in shifts] or [datetime.now().date()]
+    first_day = min(dates) - timedelta(days=1)
+    origin = first_day - timedelta(days=first_day.weekday())
+    last_day = max(dates) + timedelta(days=6 - max(dates).weekday())
+    n_days = (last_day - origin).days + 1
 
-    # Save schedules
-    Schedule.objects.bulk_create(schedules)
+    shift_start, shift_end = shift_intervals([s.date for s in shifts], [s.shift_time for s in shifts], origin)
+    shift_day = shift_start // MINUTES_PER_DAY
+    shift_ids = np.array([s.id for s in shifts], dtype=np.int64)
 
-    # Calculate metrics
-    total_satisfaction = sum(e.satisfaction_score for e in employees if any(s.employee == e for s in schedules))
-    unassigned_shifts = shifts.count() - len(schedules)
+    # Ratings, availability and the rest of the employees' inputs, mostly from the cache
+    features = employee_features(employees)
+    role_rows = {role: ([], []) for role, _ in Role.choices}
+    for i, employee in enumerate(features):
+        for role, rating in employee['ratings'].items():
+            role_rows[role][0].append(i)
+            role_rows[role][1].append(rating)
 
-    # Store scheduling result
-    SchedulingResult.objects.create(
-        total_satisfaction=total_satisfaction,
-        unassigned_shifts=unassigned_shifts
+    # Employees x dates x shift times availability and preferences
+    unique_dates = sorted(set(s.date for s in shifts))
+    available, preferred = availability_masks(features, unique_dates)
+    date_column = {d: k for k, d in enumerate(unique_dates)}
+    shift_column = np.array([date_column[s.date] for s in shifts], dtype=np.int64)
+    shift_code = np.array([SHIFT_TIME_CODES[s.shift_time] for s in shifts], dtype=np.int64)
+
+    # Feasible pairs only: for every role, the employees holding it against its
+    # shifts, kept where the employee is available for the shift
+    role_cols = {}
+    for j, shift in enumerate(shifts):
+        role_cols.setdefault(shift.role, []).append(j)
+    edge_row, edge_col, edge_rating = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)], [np.empty(0)]
+    for role, cols in role_cols.items():
+        rows, ratings = (np.array(values, dtype=np.int64) for values in role_rows[role])
+        rows, cols, ratings = np.repeat(rows, len(cols)), np.tile(cols, rows.size), np.repeat(ratings, len(cols))
+        on_duty = available[rows, shift_column[cols], shift_code[cols]]
+        edge_row.append(rows[on_duty])
+        edge_col.append(cols[on_duty])
+        edge_rating.append(ratings[on_duty])
+    edge_row, edge_col, edge_rating = (np.concatenate(parts) for parts in (edge_row, edge_col, edge_rating))
+    edge_preferred = preferred[edge_row, shift_column[edge_col], shift_code[edge_col]]
+
+    satisfaction = np.array([f['satisfaction'] for f in features], dtype=float)
+    max_minutes = np.array([f['max_minutes'] for f in features], dtype=float)
+
+    # Shifts already scheduled from the day before the horizon to the day after, for
+    # overlaps and rest gaps, in one query
+    timeline = Timeline(len(employees), n_days)
+    existing = Schedule.objects.filter(
+        employee__in=employees,
+        shift__date__range=[first_day, min(max(dates) + timedelta(days=1), last_day)]
+    ).values_list('employee_id', 'shift_id', 'shift__date', 'shift__shift_time')
+    shift_id_set = {s.id for s in shifts} if kept is not None else set()
+    kept = set(kept or ())
+    reopened_minutes = Counter()
+    if existing:
+        employee_ids, existing_shifts, existing_dates, existing_times = zip(*existing)
+        starts, ends = shift_intervals(existing_dates, existing_times, origin)
+        for employee_id, shift_id, start, end in zip(employee_ids, existing_shifts, starts.tolist(), ends.tolist()):
+            if shift_id in shift_id_set and (employee_id, shift_id) not in kept:
+                reopened_minutes[employee_index[employee_id], start // MINUTES_PER_WEEK] += end - start
+            else:
+                timeline.add(employee_index[employee_id], start, end)
+
+    # Weekly totals from the ledger, in one query, less the assignments being replaced
+    timeline.week_minutes[:] = 0
+    for (employee_id, week), minutes in week_minutes(list(employee_index), origin, last_day - timedelta(days=6)).items():
+        timeline.week_minutes[employee_index[employee_id], (week - origin).days // 7] = minutes
+    for (row, week), minutes in reopened_minutes.items():
+        timeline.week_minutes[row, week] -= minutes
+
+    return CostModel(
+        employee_ids=[e.id for e in employees],
+        shift_ids=shift_ids,
+        origin=origin,
+        edge_row=edge_row,
+        edge_col=edge_col,
+        edge_rating=edge_rating,
+        edge_preferred=edge_preferred,
+        satisfaction=satisfaction,
+        max_minutes=max_minutes,
+        shift_start=shift_start,
+        shift_end=shift_end,
+        shift_day=shift_day,
+        timeline=timeline,
     )
 
-    return total_satisfaction, unassigned_shifts
\ No newline at end of file
+def warm_start_pairs(shifts, source):
+    """
+    (employee_id, shift_id) guesses for `shifts` from an earlier schedule: each shift
+    is offered the employees who worked the same role and shift time on the same
+    weekday, most recent first. `source` is a WarmStartSource: the week before the
+    first shift, or the schedule of the latest SchedulingResult that stored one.
+    """
+    if not shifts:
+        return []
+    if source == WarmStartSource.SCHEDULE:
+        first_date = min(s.date for s in shifts)
+        earlier = Schedule.objects.filter(shift__date__range=[first_date - timedelta(days=7), first_date - timedelta(days=1)])
+    elif source == WarmStartSource.LAST_RUN:
+        # Runs that found nothing to change leave no rows of their own
+        latest = SchedulingResult.objects.filter(schedules__isnull=False).order_by('-created_at').first()
+        earlier = Schedule.objects.filter(result=latest) if latest else Schedule.objects.none()
+    else:
+        raise ValueError(f"Unknown warm start source: {source}")
+
+    staff = {}
+    for employee_id, role, date, shift_time in earlier.order_by('-shift__date').values_list(
+            'employee_id', 'shift__role', 'shift__date', 'shift__shift_time'):
+        staff.setdefault((role, date.weekday(), shift_time), []).append(employee_id)
+    return [
+        (employee_id, shift.id)
+        for shift in shifts
+        for employee_id in dict.fromkeys(staff.get((shift.role, shift.date.weekday(), shift.shift_time), ()))
+    ]
+
+def find_replacements(shift, limit=5, exclude=()):
+    """
+    The `limit` cheapest employees to take over `shift` at short notice, ranked by the
+    scheduler's cost model, leaving out the employees in `exclude`.
+
+    Only employees holding the role, available for the shift, free at that time and
+    within their weekly hours are offered. The cost of each is what giving them the
+    shift adds to the objective, including the rest-gap penalty against their shift
+    the day before and against the shift they start next.
+    """
+    candidates = list(Employee.objects.filter(roles__role=shift.role).exclude(pk__in=[e.pk for e in exclude]))
+    model = build_cost_model(candidates, [shift])
+    keep = np.flatnonzero(~model.blocked() & model.within_hours())
+    rows = model.edge_row[keep]
+
+    end = model.shift_end[0]
+    short_rest_after = np.array([model.timeline.next_start(row, end) - end < MIN_REST_MINUTES for row in rows.tolist()], dtype=bool)
+    costs = model.edge_costs()[keep] + short_rest_after * REST_GAP_PENALTY
+    short_rest = model.short_rest()[keep] | short_rest_after
+    week_minutes = model.timeline.week_minutes[rows, model.shift_week[0]]
+
+    return [
+        {
+            'employee': candidates[rows[i]],
+            'cost': float(costs[i]),
+            'rating': int(model.edge_rating[keep[i]]),
+            'preferred': bool(model.edge_preferred[keep[i]]),
+            'short_rest': bool(short_rest[i]),
+            'week_hours': float(week_minutes[i]) / 60,
+        }
+        for i in np.argsort(costs, kind='stable')[:limit].tolist()
+    ]
+
+def create_schedule(start=None, end=None, roles=None, workers=None, solver=None, time_budget=None, warm_start=None,
+                    progress=None, report=None):
+    """
+    Staff the shifts dated from `start` (today by default) to `end` (open-ended by
+    default), optionally only for some roles. Slots already taken by existing
+    Schedule rows are kept and only the remaining ones are filled. With a
+    `warm_start` source (a WarmStartSource), the assignments it suggests that
+    are still feasible are kept and only the rest of the slots are solved.
+
+    Runs whose roles and dates overlap take turns (see locking.horizon_lock); the
+    schedule is only read once the run holds its locks.
+    """
+    # `progress` is called with each SchedulingPhase as the run reaches it
+    with PhaseRecorder('create_schedule', callback=progress) as recorder:
+        recorder(SchedulingPhase.LOADING)
+        window = Shift.objects.filter(date__gte=start or timezone.localdate())
+        if end:
+            window = window.filter(date__lte=end)
+        if roles:
+            window = window.filter(role__in=roles)
+
+        dates = window.aggregate(first=Min('date'), last=Max('date'))
+        with horizon_lock(roles or Role.values, dates['first'], dates['last']) as lock:
+            # Read only now, under the locks, as other processes may have staffed the
+            # shifts while this run waited; cached descriptors from before that are
+            # at an older schedule version and get rebuilt
+            version, _ = ScheduleVersion.objects.current()
+            shift_ids = list(window.order_by('date', 'role', 'shift_time').values_list('id', flat=True))
+            shifts, required, kept = [], [], []
+            for shift_id, descriptor in shift_descriptors(shift_ids, version).items():
+                shift = Shift(id=shift_id, role=descriptor['role'], date=descriptor['date'], shift_time=descriptor['shift_time'])
+                open_slots = get_required_staff(shift) - len(descriptor['staff'])
+                if open_slots > 0:
+                    shifts.append(shift)
+                    required.append(open_slots)
+                    kept.extend((employee_id, shift_id) for employee_id in descriptor['staff'])
+            employees = list(Employee.objects.filter(roles__role__in={s.role for s in shifts}).distinct())
+            initial = warm_start_pairs(shifts, warm_start) if warm_start else None
+
+            return schedule_shifts(
+                employees, shifts, required=required, initial=initial, kept=kept, workers=workers, solver=solver,
+                time_budget=time_budget, recorder=recorder, report=report, lock=lock
+            )
+
+def reschedule(employees=(), shifts=(), workers=None, solver=None, time_budget=None, warm_start=True,
+               progress=None, report=None):
+    """
+    Re-solve only the assignments touched by the changed employees or shifts (ids).
+
+    A changed shift re-opens its own assignments. A changed employee re-opens theirs
+    over the next RESCHEDULE_DAYS days, together with the understaffed shifts in that
+    window they hold the role for and are now available for. Every other
+    assignment stays as it is, other employees' on the same shifts included, and
+    feeds the rest-gap and weekly-hours terms. With `warm_start`, the re-opened
+    assignments that are still feasible are kept, so only those the change broke move.
+    """
+    with PhaseRecorder('reschedule', callback=progress) as recorder:
+        recorder(SchedulingPhase.LOADING)
+        changed_employees = {getattr(e, 'pk', e) for e in employees}
+        changed_shifts = {getattr(s, 'pk', s) for s in shifts}
+        roles = set(EmployeeRole.objects.filter(employee__in=changed_employees).values_list('role', flat=True))
+        today = timezone.localdate()
+        # Their assignments in roles they no longer hold are re-opened as well
+        assigned = Schedule.objects.filter(employee__in=changed_employees).values('shift_id')
+        window = Shift.objects.filter(
+            Q(pk__in=changed_shifts)
+            | Q(Q(role__in=roles) | Q(pk__in=assigned), date__range=[today, today + timedelta(days=RESCHEDULE_DAYS - 1)])
+        )
+
+        dates = window.aggregate(first=Min('date'), last=Max('date'))
+        lock_roles = set(window.values_list('role', flat=True).distinct())
+        with horizon_lock(lock_roles, dates['first'], dates['last']) as lock:
+            staff = {}
+            for employee_id, shift_id in Schedule.objects.filter(shift__in=window).order_by('id').values_list('employee_id', 'shift_id'):
+                staff.setdefault(shift_id, []).append(employee_id)
+            window_shifts = list(window.order_by('date', 'role', 'shift_time'))
+
+            # Whether a changed employee holding the shift's role is now available for it
+            features = employee_features(list(Employee.objects.filter(pk__in=changed_employees)))
+            unique_dates = sorted({s.date for s in window_shifts})
+            available, _ = availability_masks(features, unique_dates)
+            date_column = {d: k for k, d in enumerate(unique_dates)}
+            takers = [
+                any(shift.role in f['ratings'] and available[i, date_column[shift.date], SHIFT_TIME_CODES[shift.shift_time]]
+                    for i, f in enumerate(features))
+                for shift in window_shifts
+            ]
+
+            shifts, required, kept, reopened = [], [], [], []
+            for shift, takeable in zip(window_shifts, takers):
+                assigned = staff.get(shift.id, [])
+                moving = [e for e in assigned if shift.id in changed_shifts or e in changed_employees]
+                staying = [e for e in assigned if e not in moving]
+                open_slots = get_required_staff(shift) - len(staying)
+                if moving or shift.id in changed_shifts or (open_slots > 0 and takeable):
+                    shifts.append(shift)
+                    required.append(max(open_slots, 0))
+                    kept.extend((e, shift.id) for e in staying)
+                    reopened.extend((e, shift.id) for e in moving)
+            employees = list(Employee.objects.filter(roles__role__in={s.role for s in shifts}).distinct())
+            return schedule_shifts(
+                employees, shifts, required=required, initial=reopened if warm_start else None, kept=kept,
+                workers=workers, solver=solver, time_budget=time_budget, recorder=recorder, report=report, lock=lock
+            )
+
+def schedule_shifts(employees, shifts, required=None, initial=None, kept=None, workers=None, solver=None,
+                    time_budget=None, recorder=None, report=None, lock=None):
+    """
+    Staff `shifts` from `employees` with the `solver` backend (see solvers.solve) and
+    store the run's SchedulingResult. `recorder` is the PhaseRecorder of the calling
+    run, whose phases end up in the result. Backends that improve a schedule over
+    time stop after `time_budget` seconds and call `report` with the best one so far.
+
+    `initial` holds (employee_id, shift_id) pairs of an earlier schedule: those still
+    feasible are kept as they are and the solver only fills the slots left open.
+
+    `kept` holds the current assignments of `shifts` that stay, next to which the
+    `required` open slots are filled. Without it the shifts are solved afresh. Either
+    way the shifts' schedule is then replaced in one transaction (replace_schedules).
+    `lock` is the ScheduleLock the caller holds; its wait and hold times are stored,
+    the wait including that for the assigned employees (see locking.employee_lock).
+    """
+    recorder = recorder or PhaseRecorder('schedule_shifts')
+    with recorder:
+        recorder(SchedulingPhase.COST_MATRIX)
+        version, _ = ScheduleVersion.objects.current()
+        model = build_cost_model(employees, shifts, kept=kept or ())
+        if required is None:
+            required = [get_required_staff(shift) for shift in shifts]
+
+        # Keep what still holds of the earlier schedule, then fill every open slot
+        recorder(SchedulingPhase.SOLVE)
+        seeded, open_slots = model.seed(seed_pairs(model, initial or ()), required)
+        assignments, solver = solve(model, open_slots, solver=solver, workers=workers, time_budget=time_budget, report=report)
+        assignments = seeded + assignments
+
+        # Runs over other roles may have given the same employees shifts meanwhile.
+        # Holding the assigned employees' weeks, check against the schedule as it is
+        # now, and leave open the slots whose assignment no longer fits
+        recorder(SchedulingPhase.PERSIST)
+        with employee_lock((employees[r].id, shifts[c].date) for r, c in assignments) as staff_lock:
+            if ScheduleVersion.objects.current()[0] != version:
+                model = build_cost_model(employees, shifts, kept=kept or ())
+                assignments, _ = model.seed(assignments, required)
+
+            staffed = Counter(c for _, c in assignments)
+            total_satisfaction = sum(employees[r].satisfaction_score for r in {r for r, _ in assignments})
+            unassigned_shifts = sum(1 for c, required_staff in enumerate(required) if staffed[c] < required_staff)
+            rows, cols = np.array(assignments, dtype=np.int64).reshape(-1, 2).T
+
+            # Save the result and its schedules together
+            with transaction.atomic():
+                result = SchedulingResult.objects.create(
+                    total_satisfaction=total_satisfaction,
+                    unassigned_shifts=unassigned_shifts,
+                    employee_count=model.shape[0],
+                    shift_count=model.shape[1],
+                    feasible_pairs=model.edge_row.size,
+                    objective=float(model.assignment_costs(rows, cols).sum()),
+                    peak_memory=recorder.memory.peak,
+                    solver_backend=solver,
+                    seeded_assignments=len(seeded)
+                )
+                pairs = [(employees[r].id, shifts[c].id) for r, c in assignments]
+                replace_schedules(model.shift_ids.tolist(), list(kept or ()) + pairs, result)
+
+    result.phases = {phase: measurement.as_dict() for phase, measurement in recorder.phases.items()}
+    result.query_count = sum(measurement.queries for measurement in recorder.phases.values())
+    result.lock_wait = staff_lock.wait_seconds
+    if lock:
+        result.lock_wait += lock.wait_seconds
+        result.lock_hold = lock.held_seconds
+    result.save(update_fields=['phases', 'query_count', 'lock_wait', 'lock_hold'])
+
+    return total_satisfaction, unassigned_shifts
+
+def seed_pairs(model, initial):
+    """(employee_id, shift_id) pairs as (row, col) pairs of the model, skipping those outside it."""
+    rows = {employee_id: row for row, employee_id in enumerate(model.employee_ids.tolist())}
+    cols = {shift_id: col for col, shift_id in enumerate(model.shift_ids.tolist())}
+    return [(rows[e], cols[s]) for e, s in initial if e in rows and s in cols]
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.db import transaction
+
+from .models import Role, Shift, ShiftTime
+
+
+def generate_shifts_for_period(start_date, end_date):
+    """
+    Create every missing Role x ShiftTime shift between the two dates, inclusive.
+    Existing shifts are fetched in one query and the rest inserted in bulk, so
+    running it again over the same period creates nothing. Returns the number of
+    shifts created.
+    """
+    days = (end_date - start_date).days + 1
+    wanted = {
+        (role, start_date + timedelta(days=offset), shift_time)
+        for offset in range(days) for role in Role.values for shift_time in ShiftTime.values
+    }
+
+    with transaction.atomic():
+        existing = set(Shift.objects.filter(date__range=[start_date, end_date]).values_list('role', 'date', 'shift_time'))
+        missing = [Shift(role=role, date=date, shift_time=shift_time) for role, date, shift_time in sorted(wanted - existing)]
+        # The unique constraint turns a concurrent insert of the same shift into a no-op
+        Shift.objects.bulk_create(missing, batch_size=1000, ignore_conflicts=True)
+
+    return len(missing)
@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .caching import forget_employees, forget_shifts
+from .ledger import apply_week_deltas, assignment_deltas, week_deltas
+from .models import AvailabilityException, Employee, EmployeeFeaturesVersion, EmployeeRole, Schedule, ScheduleVersion, Shift
+
+# Cache entries are dropped once the change is committed, so that no other process
+# caches the old rows again in between. Caches of other processes are not reached;
+# their entries fail the version checks in caching instead
+
+
+@receiver([post_save, post_delete], sender=Employee)
+def employee_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: forget_employees([instance.pk]))
+
+
+@receiver([post_save, post_delete], sender=EmployeeRole)
+@receiver([post_save, post_delete], sender=AvailabilityException)
+def employee_inputs_changed(sender, instance, origin=None, **kwargs):
+    # The version row goes with the employee when they are deleted
+    if instance.employee_id not in getattr(origin, '_deleted_employee_ids', ()):
+        EmployeeFeaturesVersion.objects.bump(instance.employee_id)
+    transaction.on_commit(lambda: forget_employees([instance.employee_id]))
+
+
+@receiver([post_save, post_delete], sender=Schedule)
+@receiver([post_save, post_delete], sender=Shift)
+@receiver([post_save, post_delete], sender=Employee)
+def schedule_listing_changed(sender, **kwargs):
+    # Changes what the schedule views show, so their ETag and Last-Modified move on
+    ScheduleVersion.objects.bump()
+
+
+@receiver([post_save, post_delete], sender=Shift)
+def shift_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: forget_shifts([instance.pk]))
+
+
+@receiver(pre_save, sender=Shift)
+def shift_changing(sender, instance, **kwargs):
+    # Remember when an edited shift was, to move its minutes in post_save
+    instance._previous = None
+    if instance.pk is not None:
+        instance._previous = Shift.objects.filter(pk=instance.pk).values_list('date', 'shift_time').first()
+
+
+@receiver(post_save, sender=Shift)
+def shift_saved(sender, instance, **kwargs):
+    # Moving a staffed shift to another date or time moves its minutes in the ledger
+    previous = getattr(instance, '_previous', None)
+    if previous and previous != (instance.date, instance.shift_time):
+        staff = list(Schedule.objects.filter(shift_id=instance.pk).values_list('employee_id', flat=True))
+        deltas = week_deltas((employee_id, instance.date, instance.shift_time) for employee_id in staff)
+        deltas.update(week_deltas(((employee_id, *previous) for employee_id in staff), sign=-1))
+        apply_week_deltas(deltas)
+
+
+@receiver(pre_save, sender=Schedule)
+def schedule_changing(sender, instance, **kwargs):
+    # Remember what an edited assignment was, to move its minutes in post_save
+    instance._previous = None
+    if instance.pk is not None:
+        instance._previous = Schedule.objects.filter(pk=instance.pk).values_list('employee_id', 'shift_id').first()
+
+
+@receiver(post_save, sender=Schedule)
+def schedule_saved(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    apply_week_deltas(assignment_deltas(added=[(instance.employee_id, instance.shift_id)], removed=[previous] if previous else []))
+    transaction.on_commit(lambda: forget_shifts([instance.shift_id] + ([previous[1]] if previous else [])))
+
+
+@receiver(pre_delete, sender=Employee)
+def employee_deleting(sender, instance, origin=None, **kwargs):
+    # pre_delete is sent for every object of a delete before any row goes, so the
+    # assignments deleted along with an employee can tell, whatever the delete started from
+    if origin is not None:
+        origin.__dict__.setdefault('_deleted_employee_ids', set()).add(instance.pk)
+
+
+@receiver(post_delete, sender=Schedule)
+def schedule_deleted(sender, instance, origin=None, **kwargs):
+    # Deleting the employee deletes their ledger rows too
+    if instance.employee_id not in getattr(origin, '_deleted_employee_ids', ()):
+        apply_week_deltas(assignment_deltas(removed=[(instance.employee_id, instance.shift_id)]))
+    transaction.on_commit(lambda: forget_shifts([instance.shift_id]))
@@ -0,0 +1,194 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse.csgraph import connected_components, min_weight_full_bipartite_matching
+
+# Cost of leaving an employee without a slot in a round. Every row gets its own
+# such fallback column, so a full matching always exists even when a row or a
+# column has no feasible pair left.
+UNASSIGNED = 1e9
+
+# Pool workers are started from a forkserver (spawned where that is not available)
+# instead of being forked from the caller, which is usually a multi-threaded job
+# worker whose locks and connections a fork would copy in whatever state they are in.
+# The forkserver preloads this module, so every worker starts with NumPy and SciPy
+# already imported.
+if 'forkserver' in multiprocessing.get_all_start_methods():
+    MP_CONTEXT = multiprocessing.get_context('forkserver')
+    MP_CONTEXT.set_forkserver_preload([__name__])
+else:
+    MP_CONTEXT = multiprocessing.get_context('spawn')
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def match_sparse(costs, rows, slots, n_rows, n_slots):
+    """
+    Minimum-cost matching of the (rows[i], slots[i]) edges that fills as many slots
+    as possible. Returns the matched rows and slots.
+    """
+    # Costs are shifted by one so that zero-cost pairs are not dropped as
+    # implicit zeros; every row is matched once, so the optimum is unchanged
+    graph = csr_matrix(
+        (np.concatenate([costs + 1, np.full(n_rows, UNASSIGNED)]),
+         (np.concatenate([rows, np.arange(n_rows)]),
+          np.concatenate([slots, n_slots + np.arange(n_rows)]))),
+        shape=(n_rows, n_slots + n_rows),
+    )
+    row_ind, slot_ind = min_weight_full_bipartite_matching(graph)
+    taken = slot_ind < n_slots
+    return row_ind[taken], slot_ind[taken]
+
+
+def match_dense(costs, rows, slots, n_rows, n_slots):
+    """match_sparse() on a dense rows x slots matrix with the Hungarian algorithm."""
+    matrix = np.full((n_rows, n_slots), UNASSIGNED)
+    matrix[rows, slots] = costs
+    row_ind, slot_ind = linear_sum_assignment(matrix)
+    taken = matrix[row_ind, slot_ind] < UNASSIGNED
+    return row_ind[taken], slot_ind[taken]
+
+
+def solve_staffing(model, required, match=match_sparse):
+    """
+    Staff every shift with up to `required[col]` employees.
+
+    Each shift is expanded into one column per open slot and employees are assigned
+    to slots round by round: every round is a single sparse matching over the whole
+    horizon in which an employee takes at most one more shift. Between rounds the
+    costs are refreshed with the rest-gap and weekly-hours terms of the shifts
+    taken so far, shifts overlapping them are blocked and shifts that would push an
+    employee past max_hours_per_week are dropped. Returns (row, col) pairs into the
+    model's employees and shifts.
+    """
+    open_slots = np.array(required, dtype=np.int64)
+    blocked = model.blocked()
+    assignments = []
+
+    while open_slots.any():
+        feasible = np.flatnonzero(~blocked & model.within_hours() & (open_slots[model.edge_col] > 0))
+        if not feasible.size:
+            break
+        costs = model.edge_costs()[feasible]
+        rows, edge_rows = np.unique(model.edge_row[feasible], return_inverse=True)
+        cols, edge_cols = np.unique(model.edge_col[feasible], return_inverse=True)
+
+        # One column per open slot, never more than there are employees to fill them.
+        # Every feasible edge is repeated once for each slot of its shift.
+        slot_counts = np.minimum(open_slots[cols], rows.size)
+        first_slot = np.cumsum(slot_counts) - slot_counts
+        repeats = slot_counts[edge_cols]
+        edge_ind = np.repeat(np.arange(feasible.size), repeats)
+        offsets = np.arange(edge_ind.size) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        slot_ind = first_slot[edge_cols[edge_ind]] + offsets
+        n_slots = int(slot_counts.sum())
+
+        row_ind, slot_match = match(costs[edge_ind], edge_rows[edge_ind], slot_ind, rows.size, n_slots)
+        if not row_ind.size:
+            break
+        slot_cols = np.repeat(cols, slot_counts)
+        for row, col in zip(rows[row_ind], slot_cols[slot_match]):
+            model.assign(row, col)
+            blocked[model.row_edges(row)] = model.overlapping(row)
+            open_slots[col] -= 1
+            assignments.append((int(row), int(col)))
+
+    return assignments
+
+
+def decompose(model):
+    """
+    Split the model into blocks that can be solved independently.
+
+    Employees and shifts are first grouped into the connected components of the
+    eligibility graph, so roles that share no employee end up apart. Inside a
+    component the shifts are split by week: weeks only interact through the
+    rest-gap and overlap checks at their boundaries, so all even weeks can be solved
+    side by side, and then all odd weeks once the even weeks' assignments are known.
+    Returns two phases of (rows, cols) blocks.
+    """
+    n_rows, n_cols = model.shape
+    graph = coo_matrix(
+        (np.ones(model.edge_row.size), (model.edge_row, model.edge_col + n_rows)),
+        shape=(n_rows + n_cols,) * 2,
+    )
+    _, labels = connected_components(graph, directed=False)
+    row_labels, col_labels = labels[:n_rows], labels[n_rows:]
+
+    phases = ([], [])
+    shift_week = model.shift_week
+    for label in np.unique(labels):
+        block_rows = np.flatnonzero(row_labels == label)
+        block_cols = np.flatnonzero(col_labels == label)
+        if not block_rows.size or not block_cols.size:
+            continue  # Nobody can work these shifts, or nothing for these employees
+        for week in np.unique(shift_week[block_cols]):
+            phases[week % 2].append((block_rows, block_cols[shift_week[block_cols] == week]))
+    return phases
+
+
+def solve_blocks(model, required, workers=None, match=match_sparse):
+    """
+    Solve the blocks of decompose() in a process pool and merge the assignments
+    back into the model. Returns (row, col) pairs like solve_staffing().
+    """
+    workers = workers or os.cpu_count() or 1
+    required = np.asarray(required)
+    phases = decompose(model)
+    if workers > 1 and max(len(blocks) for blocks in phases) > 1:
+        executor = get_pool(workers)
+        try:
+            return _solve_phases(model, required, phases, match, executor.map)
+        except BrokenProcessPool:
+            discard_pool(workers, executor)
+            raise
+    return _solve_phases(model, required, phases, match, map)
+
+
+def get_pool(workers):
+    """
+    The process pool with `workers` processes, started on first use and shared by
+    every later run and thread in this process.
+    """
+    with _pools_lock:
+        executor = _pools.get(workers)
+        if executor is None:
+            executor = _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=MP_CONTEXT)
+        return executor
+
+
+def discard_pool(workers, executor):
+    """Drop a broken pool so that the next run starts a fresh one."""
+    with _pools_lock:
+        if _pools.get(workers) is executor:
+            del _pools[workers]
+    executor.shutdown(wait=False)
+
+
+def solve_sparse(model, required, workers=None, **options):
+    return solve_blocks(model, required, workers=workers, match=match_sparse)
+
+
+def solve_hungarian(model, required, workers=None, **options):
+    return solve_blocks(model, required, workers=workers, match=match_dense)
+
+
+def _solve_phases(model, required, phases, match, map_blocks):
+    assignments = []
+    for blocks in phases:
+        submodels = [model.take(rows, cols) for rows, cols in blocks]
+        results = map_blocks(solve_staffing, submodels, [required[cols] for _, cols in blocks], [match] * len(blocks))
+
+        # Later phases see this phase's assignments through the model's state
+        for (rows, cols), block_assignments in zip(blocks, results):
+            for r, c in block_assignments:
+                model.assign(rows[r], cols[c])
+                assignments.append((int(rows[r]), int(cols[c])))
+    return assignments
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+AUTO = 'auto'
+
+# Dotted paths of the solver backends, imported on first use so that loading the
+# views and the job queue does not pull in NumPy or SciPy. Each backend is called
+# as solve(model, required, workers=None, **options), records its assignments
+# with model.assign() and returns them as (row, col) pairs; options a backend has
+# no use for are ignored.
+SOLVER_BACKENDS = {
+    'anytime': 'scheduler.anytime.solve_anytime',
+    'greedy': 'scheduler.greedy.solve_greedy',
+    'hungarian': 'scheduler.solver.solve_hungarian',
+    'sparse_matching': 'scheduler.solver.solve_sparse',
+}
+
+SOLVER_CHOICES = [
+    (AUTO, 'Automatic'),
+    ('anytime', 'Greedy with local search'),
+    ('greedy', 'Greedy'),
+    ('hungarian', 'Dense Hungarian'),
+    ('sparse_matching', 'Sparse matching'),
+]
+
+# Automatic selection: greedy below TINY_PAIRS feasible pairs, greedy improved by
+# local search for a time budget above HUGE_PAIRS, the dense Hungarian algorithm
+# when at least DENSE_MIN_DENSITY of the employee x shift pairs are feasible and
+# the employees x slots matrix stays under DENSE_MAX_CELLS, and sparse matching
+# otherwise
+TINY_PAIRS = 50
+HUGE_PAIRS = 5_000_000
+DENSE_MIN_DENSITY = 0.25
+DENSE_MAX_CELLS = 2_000_000
+
+
+def select_backend(model, required):
+    n_rows, n_cols = model.shape
+    pairs = model.edge_row.size
+    if pairs <= TINY_PAIRS:
+        return 'greedy'
+    if pairs >= HUGE_PAIRS:
+        return 'anytime'
+    density = pairs / (n_rows * n_cols)
+    if density >= DENSE_MIN_DENSITY and n_rows * sum(required) <= DENSE_MAX_CELLS:
+        return 'hungarian'
+    return 'sparse_matching'
+
+
+def get_backend(name):
+    if name not in SOLVER_BACKENDS:
+        raise ValueError(f"Unknown solver backend: {name}")
+    return import_string(SOLVER_BACKENDS[name])
+
+
+def solve(model, required, solver=None, workers=None, **options):
+    """
+    Staff the model's shifts with the `solver` backend, the SCHEDULER_SOLVER setting
+    by default; 'auto' picks one from the size and density of the model. `options`
+    are passed on to the backend. Returns the (row, col) assignments and the name of
+    the backend used.
+    """
+    solver = solver or getattr(settings, 'SCHEDULER_SOLVER', AUTO)
+    if solver == AUTO:
+        solver = select_backend(model, required)
+    return get_backend(solver)(model, required, workers=workers, **options), solver
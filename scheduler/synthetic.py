@@ -0,0 +1,66 @@
+import random
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .ledger import apply_week_deltas, assignment_deltas
+from .models import AvailabilityException, Employee, EmployeeRole, ExceptionKind, Role, Schedule, ScheduleVersion, Shift, ShiftTime, weekly_bit
+from .shifts import generate_shifts_for_period
+
+
+def seed_restaurant(employees=300, weeks=4, start=None, seed=None, max_roles=2,
+                    availability=0.8, preferences=10, time_off=0.1, scheduled=0.0):
+    """
+    Create a synthetic restaurant: `weeks` of shifts from `start` (today by default)
+    and `employees` staff holding 1 to `max_roles` random roles with random ratings.
+    Each employee is available for a weekly shift time with probability `availability`,
+    prefers `preferences` random weekly shift times, takes up to a week off with
+    probability `time_off`, and is already scheduled on a `scheduled` fraction of the
+    shifts of their roles. Returns the created employees.
+    """
+    rng = random.Random(seed)
+    start = start or timezone.localdate()
+    end = start + timedelta(weeks=weeks, days=-1)
+    generate_shifts_for_period(start, end)
+
+    shifts = list(Shift.objects.filter(date__range=[start, end]).values_list('id', 'role'))
+    weekly_bits = [weekly_bit(weekday, shift_time) for weekday in range(7) for shift_time in ShiftTime.values]
+    staff = Employee.objects.bulk_create([
+        Employee(
+            name=f"Employee {i + 1}",
+            max_hours_per_week=rng.choice([24, 32, 40, 48]),
+            availability_mask=sum(bit for bit in weekly_bits if rng.random() < availability),
+            preference_mask=sum(rng.sample(weekly_bits, min(preferences, len(weekly_bits)))),
+            satisfaction_score=round(rng.uniform(0, 100), 1)
+        )
+        for i in range(employees)
+    ])
+    days_off = []
+    for employee in staff:
+        if rng.random() < time_off:
+            first = start + timedelta(days=rng.randrange((end - start).days + 1))
+            days_off.append(AvailabilityException(
+                employee=employee,
+                start_date=first,
+                end_date=first + timedelta(days=rng.randint(0, 6)),
+                kind=ExceptionKind.UNAVAILABLE
+            ))
+    AvailabilityException.objects.bulk_create(days_off)
+    roles = [
+        EmployeeRole(employee=employee, role=role, rating=rng.randint(1, 5))
+        for employee in staff
+        for role in rng.sample(Role.values, rng.randint(1, min(max_roles, len(Role.values))))
+    ]
+    EmployeeRole.objects.bulk_create(roles)
+
+    if scheduled:
+        assignments = Schedule.objects.bulk_create([
+            Schedule(employee=employee_role.employee, shift_id=shift_id)
+            for employee_role in roles
+            for shift_id, role in shifts
+            if role == employee_role.role and rng.random() < scheduled
+        ])
+        # Bulk inserts send no signals, so the ledger and the schedule version are updated here
+        apply_week_deltas(assignment_deltas(added=[(a.employee_id, a.shift_id) for a in assignments]))
+        ScheduleVersion.objects.bump()
+    return staff
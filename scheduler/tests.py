@@ -1,3 +1,473 @@
-from django.test import TestCase
+import random
+from datetime import date, timedelta
+from unittest import skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .caching import cache_usable, employee_features, employee_key, scheduler_cache, shift_descriptors, shift_key
+from .jobs import JOB_STALE_AFTER, claim_next_job, fail_stale_jobs, heartbeat, report_best, report_progress, run_job
+from .ledger import apply_week_deltas, rebuild_week_hours, week_of
+from .locking import LockTimeout, ScheduleLock, employee_lock_keys, horizon_lock, lock_keys
+from .models import (
+    ALL_SHIFT_TIMES, SHIFT_TIMES, AvailabilityException, Employee, EmployeeRole, EmployeeWeekHours, ExceptionKind, JobStatus, Role, Schedule, SchedulingJob,
+    SchedulingPhase, SchedulingResult, ScheduleVersion, Shift, ShiftTime
+)
+from .persistence import replace_schedules
+from .scheduling import build_cost_model, calculate_cost, create_schedule, find_replacements, get_required_staff, reschedule
+from .solver import decompose
+from .solvers import SOLVER_BACKENDS
+
+START = date(2026, 11, 2)
+
+
+def seed_schedule(n_employees=20, days=10, seed=1, start=START):
+    """
+    Random employees, shifts for every role and shift time over `days` days from
+    `start`, and a scattering of assignments, including some on the day before.
+    """
+    rnd = random.Random(seed)
+    Shift.objects.bulk_create(
+        Shift(role=role, date=start + timedelta(days=day), shift_time=shift_time)
+        for day in range(-1, days) for role in Role.values for shift_time in ShiftTime.values
+    )
+    employees = []
+    for i in range(n_employees):
+        employee = Employee.objects.create(
+            name=f'Employee {i}',
+            availability_mask=rnd.getrandbits(42) | rnd.getrandbits(42),
+            preference_mask=rnd.getrandbits(42) & rnd.getrandbits(42),
+            satisfaction_score=rnd.uniform(0, 100),
+            max_hours_per_week=rnd.choice([9, 18, 27, 40]),
+        )
+        for role in rnd.sample(Role.values, rnd.randint(1, 3)):
+            EmployeeRole.objects.create(employee=employee, role=role, rating=rnd.randint(1, 5))
+        for _ in range(rnd.randint(0, 3)):
+            first = start + timedelta(days=rnd.randint(-3, days))
+            AvailabilityException.objects.create(
+                employee=employee, start_date=first, end_date=first + timedelta(days=rnd.randint(0, 3)),
+                shift_times=rnd.getrandbits(6), kind=rnd.choice(ExceptionKind.values),
+            )
+        employees.append(employee)
+
+    shifts = list(Shift.objects.all())
+    for employee, shift in rnd.sample([(e, s) for e in employees for s in shifts], n_employees * 4):
+        Schedule.objects.create(employee=employee, shift=shift)
+    return employees
+
+
+def ledger():
+    """The weekly-hours ledger as {(employee_id, week): minutes}, leaving out empty weeks."""
+    return {(e, w): m for e, w, m in EmployeeWeekHours.objects.values_list('employee_id', 'week', 'minutes') if m}
+
+
+class CostModelTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employees = seed_schedule()
+
+    def test_matrix_matches_calculate_cost(self):
+        shifts = list(Shift.objects.filter(date__gte=START).order_by('date', 'role', 'shift_time'))
+        expected = np.array([[calculate_cost(e, s) for s in shifts] for e in self.employees])
+
+        matrix = build_cost_model(self.employees, shifts).matrix()
+
+        np.testing.assert_array_equal(matrix, expected)
+        # The seed is meant to reach every term, not just the base cost
+        self.assertTrue(np.isinf(expected).any())
+        self.assertTrue((expected[np.isfinite(expected)] > 70).any())
+
+
+# The configured query thresholds, raising QueryThresholdExceeded instead of logging
+# a warning, so that an N+1 query fails the test
+STRICT_INSTRUMENTATION = {**settings.SCHEDULER_INSTRUMENTATION, 'RAISE_ON_THRESHOLD': True}
+
+
+@override_settings(SCHEDULER_INSTRUMENTATION=STRICT_INSTRUMENTATION)
+class QueryThresholdTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_schedule(n_employees=40)
+        cls.manager = User.objects.create_superuser('manager', password='secret')
+        cls.manager.groups.add(Group.objects.create(name='Managers'))
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def test_view_schedule(self):
+        response = self.client.get(reverse('view_schedule'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['schedules']), 100)
+
+    def test_admin_changelists(self):
+        for model in ('employee', 'shift', 'schedule', 'employeeweekhours'):
+            with self.subTest(model=model):
+                response = self.client.get(reverse(f'admin:scheduler_{model}_changelist'))
+                self.assertEqual(response.status_code, 200)
+
+    def test_create_schedule(self):
+        create_schedule(START, START + timedelta(days=9), workers=1)
+
+
+class StaleJobTests(TestCase):
+    def test_jobs_without_heartbeat_are_failed(self):
+        stale, alive = SchedulingJob.objects.create(), SchedulingJob.objects.create()
+        self.assertEqual(claim_next_job(), stale)
+        self.assertEqual(claim_next_job(), alive)
+        SchedulingJob.objects.update(heartbeat_at=timezone.now() - timedelta(seconds=JOB_STALE_AFTER + 1))
+        heartbeat([alive.pk])
+
+        self.assertEqual(fail_stale_jobs(), 1)
+        stale.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual(stale.status, JobStatus.FAILED)
+        self.assertIsNotNone(stale.finished_at)
+        self.assertEqual(alive.status, JobStatus.RUNNING)
+
+
+class StaleJobRunTests(TransactionTestCase):
+    # run_job closes its connection, which a test transaction would not survive
+    def test_failed_job_stays_failed(self):
+        SchedulingJob.objects.create(parameters={'start': '2030-01-01'})
+        job = claim_next_job()
+        SchedulingJob.objects.update(heartbeat_at=timezone.now() - timedelta(seconds=JOB_STALE_AFTER + 1))
+        self.assertEqual(fail_stale_jobs(), 1)
+
+        report_progress(job, SchedulingPhase.SOLVE)
+        report_best(job, {'assignments': []})
+        run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.FAILED)
+        self.assertEqual(job.phase, '')
+        self.assertIsNone(job.result)
+
+
+class CalendarFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_schedule(n_employees=5)
+        cls.user = User.objects.create_user('employee', password='secret')
+        cls.employee = Employee.objects.first()
+        cls.employee.user = cls.user
+        cls.employee.save()
+
+    def test_feed_needs_only_the_token(self):
+        response = self.client.get(reverse('employee_calendar', args=[self.employee.calendar_token]))
+        self.assertEqual(response.status_code, 200)
+        feed = b''.join(response.streaming_content).decode()
+        self.assertEqual(feed.count('BEGIN:VEVENT'), self.employee.schedule_set.count())
+        self.assertEqual(self.client.get(reverse('employee_calendar', args=['not-the-token'])).status_code, 404)
+
+    def test_reset_revokes_the_old_link(self):
+        old_token = self.employee.calendar_token
+        self.client.force_login(self.user)
+        self.client.post(reverse('reset_calendar_token'))
+        self.employee.refresh_from_db()
+        self.assertNotEqual(self.employee.calendar_token, old_token)
+        self.assertEqual(self.client.get(reverse('employee_calendar', args=[old_token])).status_code, 404)
+        self.assertContains(self.client.get(reverse('dashboard')), self.employee.calendar_token)
+
+
+class LedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employees = seed_schedule(n_employees=5)
+
+    def assertLedgerMatchesSchedule(self):
+        kept = ledger()
+        rebuild_week_hours()
+        self.assertEqual(kept, ledger())
+
+    def test_deltas_add_up(self):
+        employee = self.employees[0]
+        apply_week_deltas({(employee.pk, date(2030, 1, 7)): 60})
+        apply_week_deltas({(employee.pk, date(2030, 1, 7)): 90})
+        self.assertEqual(EmployeeWeekHours.objects.get(employee=employee, week=date(2030, 1, 7)).minutes, 150)
+
+    def test_deleting_a_user_with_schedules(self):
+        employee = Schedule.objects.first().employee
+        employee.user = User.objects.create_user('leaving')
+        employee.save()
+
+        employee.user.delete()
+
+        self.assertFalse(Employee.objects.filter(pk=employee.pk).exists())
+        self.assertFalse(EmployeeWeekHours.objects.filter(employee_id=employee.pk).exists())
+        self.assertLedgerMatchesSchedule()
+
+    def test_deleting_assignments_and_moving_shifts(self):
+        Schedule.objects.filter(employee=self.employees[1]).first().delete()
+        shift = Schedule.objects.filter(employee=self.employees[2]).first().shift
+        shift.date += timedelta(days=7)
+        shift.save()
+        self.assertLedgerMatchesSchedule()
+
+
+
+class FailedShiftMoveTests(TransactionTestCase):
+    def test_failed_shift_move_leaves_the_ledger(self):
+        # Outside a test transaction, as in autocommit, where a receiver writing the
+        # ledger before the save would commit on its own
+        seed_schedule(n_employees=5)
+        before = ledger()
+        shift = Schedule.objects.filter(shift__date__lte=START + timedelta(days=2)).first().shift
+        shift.date += timedelta(days=7)  # Onto the existing shift of that role and time
+        with self.assertRaises(IntegrityError):
+            shift.save()
+        self.assertEqual(ledger(), before)
+
+
+class CacheTests(TransactionTestCase):
+    # Outside a test transaction, as the cache is only used in autocommit
+    def setUp(self):
+        scheduler_cache().clear()
+        seed_schedule(n_employees=5, days=3)
+        self.assertTrue(cache_usable())
+
+    def test_employee_features(self):
+        employees = list(Employee.objects.all())
+        features = employee_features(employees)
+        with self.assertNumQueries(1):  # Only the versions
+            self.assertEqual(employee_features(employees), features)
+
+        role = EmployeeRole.objects.filter(employee=employees[0]).first()
+        role.rating = role.rating % 5 + 1
+        role.save()
+        self.assertIsNone(scheduler_cache().get(employee_key(employees[0].pk)))
+        self.assertEqual(employee_features(employees[:1])[0]['ratings'][role.role], role.rating)
+
+        # An entry left in another process's cache is outdated by the version
+        stale = scheduler_cache().get(employee_key(employees[0].pk))
+        role.rating = role.rating % 5 + 1
+        role.save()
+        scheduler_cache().set(employee_key(employees[0].pk), stale)
+        self.assertEqual(employee_features(employees[:1])[0]['ratings'][role.role], role.rating)
+
+    def test_shift_descriptors(self):
+        shift_ids = list(Shift.objects.values_list('id', flat=True))
+        version, _ = ScheduleVersion.objects.current()
+        descriptors = shift_descriptors(shift_ids, version)
+        with self.assertNumQueries(0):
+            self.assertEqual(shift_descriptors(shift_ids, version), descriptors)
+
+        assignment = Schedule.objects.first()
+        stale = scheduler_cache().get(shift_key(assignment.shift_id))
+        assignment.delete()
+        self.assertIsNone(scheduler_cache().get(shift_key(assignment.shift_id)))
+
+        # An entry left in another process's cache is outdated by the schedule version
+        scheduler_cache().set(shift_key(assignment.shift_id), stale)
+        descriptor = shift_descriptors([assignment.shift_id], ScheduleVersion.objects.current()[0])[assignment.shift_id]
+        self.assertNotIn(assignment.employee_id, descriptor['staff'])
+
+    def test_replaced_schedules_are_forgotten(self):
+        shift_ids = list(Shift.objects.values_list('id', flat=True))
+        shift_descriptors(shift_ids, ScheduleVersion.objects.current()[0])
+        replace_schedules(shift_ids, [])
+        self.assertEqual(scheduler_cache().get_many([shift_key(shift_id) for shift_id in shift_ids]), {})
+
+
+class ReplaceSchedulesTests(TestCase):
+    # On PostgreSQL these go through the COPY path, elsewhere through the batches
+    @classmethod
+    def setUpTestData(cls):
+        seed_schedule(n_employees=10)
+
+    def pairs(self):
+        return set(Schedule.objects.values_list('employee_id', 'shift_id'))
+
+    def test_rerun_keeps_the_schedule(self):
+        end = START + timedelta(days=9)
+        create_schedule(START, end, workers=1)
+        first = self.pairs()
+        create_schedule(START, end, workers=1)
+        self.assertEqual(self.pairs(), first)
+
+        shift_ids = Shift.objects.values_list('pk', flat=True)
+        self.assertEqual(replace_schedules(shift_ids, first), (0, 0))
+        self.assertEqual(self.pairs(), first)
+
+    def test_replace_updates_the_ledger(self):
+        shifts = list(Shift.objects.filter(date__range=[START, START + timedelta(days=3)]).values_list('pk', flat=True))
+        kept = {(e, s) for e, s in self.pairs() if s in shifts[::2]}
+        employee_ids = list(Employee.objects.values_list('pk', flat=True))
+        added = {(employee_ids[i % len(employee_ids)], shift_id) for i, shift_id in enumerate(shifts[1::3])}
+
+        removed, created = replace_schedules(shifts, kept | added)
+
+        self.assertEqual({(e, s) for e, s in self.pairs() if s in shifts}, kept | added)
+        self.assertEqual(created, len(added - kept))
+        self.assertGreater(removed, 0)
+        kept_ledger = ledger()
+        rebuild_week_hours()
+        self.assertEqual(kept_ledger, ledger())
+
+    @skipUnless(connection.vendor == 'postgresql', "COPY is PostgreSQL only")
+    def test_copy_path_marks_the_result(self):
+        result = SchedulingResult.objects.create(total_satisfaction=0, unassigned_shifts=0)
+        shift_ids = list(Shift.objects.values_list('pk', flat=True))
+        pairs = self.pairs()
+        self.assertEqual(replace_schedules(shift_ids, pairs, result), (0, 0))
+        self.assertEqual(set(result.schedules.values_list('employee_id', 'shift_id')), pairs)
+
+
+class RescheduleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        seed_schedule(n_employees=20, start=cls.today)
+        create_schedule(cls.today, cls.today + timedelta(days=9), workers=1)
+
+    def test_unavailable_employee_is_replaced(self):
+        window = Schedule.objects.filter(shift__date__gte=self.today)
+        employee_id = window.values_list('employee_id', flat=True).order_by('employee_id').first()
+        employee = Employee.objects.get(pk=employee_id)
+        freed = list(window.filter(employee=employee).values_list('shift_id', flat=True))
+        others = set(Schedule.objects.exclude(employee=employee).values_list('employee_id', 'shift_id'))
+        before = {shift_id: window.filter(shift_id=shift_id).count() for shift_id in freed}
+        # Everyone else is about full for the week by now, so someone has to be free
+        for name in ('Spare 1', 'Spare 2'):
+            spare = Employee.objects.create(name=name, availability_mask=(1 << 42) - 1, max_hours_per_week=168)
+            EmployeeRole.objects.bulk_create(EmployeeRole(employee=spare, role=role, rating=1) for role in Role.values)
+
+        AvailabilityException.objects.create(
+            employee=employee, start_date=self.today, end_date=self.today + timedelta(days=30),
+            shift_times=ALL_SHIFT_TIMES, kind=ExceptionKind.UNAVAILABLE
+        )
+        reschedule(employees=[employee.pk], workers=1)
+
+        self.assertFalse(window.filter(employee=employee).exists())
+        after = set(Schedule.objects.exclude(employee=employee).values_list('employee_id', 'shift_id'))
+        self.assertLessEqual(others, after)
+        # Every slot the employee left is taken by someone else, up to the staff the shift needs
+        for shift in Shift.objects.filter(pk__in=freed):
+            staffed = window.filter(shift=shift).count()
+            self.assertGreaterEqual(staffed, min(before[shift.pk], get_required_staff(shift)))
+            self.assertLessEqual(staffed, max(before[shift.pk] - 1, get_required_staff(shift)))
+
+
+class FindReplacementsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        day = START + timedelta(days=2)
+        cls.shift = Shift.objects.create(role=Role.COOK, date=day, shift_time=ShiftTime.MORNING)
+        overlapping = Shift.objects.create(role=Role.CASHIER, date=day, shift_time=ShiftTime.AFTERNOON)
+        day_before = Shift.objects.create(role=Role.COOK, date=day - timedelta(days=1), shift_time=ShiftTime.MORNING)
+        night_before = Shift.objects.create(role=Role.COOK, date=day - timedelta(days=1), shift_time=ShiftTime.LATE_NIGHT)
+
+        def employee(name, roles=(Role.COOK,), max_hours=40):
+            employee = Employee.objects.create(name=name, availability_mask=(1 << 42) - 1, max_hours_per_week=max_hours)
+            EmployeeRole.objects.bulk_create(EmployeeRole(employee=employee, role=role, rating=3) for role in roles)
+            return employee
+
+        cls.free = employee('Free')
+        cls.short_rest = employee('Short rest')
+        Schedule.objects.create(employee=cls.short_rest, shift=night_before)
+        employee('Not a cook', roles=(Role.CASHIER,))
+        unavailable = employee('Unavailable')
+        AvailabilityException.objects.create(
+            employee=unavailable, start_date=day, end_date=day, shift_times=ALL_SHIFT_TIMES, kind=ExceptionKind.UNAVAILABLE
+        )
+        busy = employee('Busy', roles=(Role.COOK, Role.CASHIER))
+        Schedule.objects.create(employee=busy, shift=overlapping)
+        over_hours = employee('Over hours', max_hours=9)
+        Schedule.objects.create(employee=over_hours, shift=day_before)
+        cls.excluded = employee('Excluded')
+
+    def test_only_free_eligible_staff_are_offered(self):
+        offers = find_replacements(self.shift, exclude=[self.excluded])
+
+        self.assertEqual([offer['employee'] for offer in offers], [self.free, self.short_rest])
+        self.assertEqual([offer['short_rest'] for offer in offers], [False, True])
+        self.assertLess(offers[0]['cost'], offers[1]['cost'])
+        self.assertEqual(offers[1]['week_hours'], 9)
+
+
+class LockTests(TestCase):
+    def test_overlapping_runs_share_keys(self):
+        # A run ending on a Sunday and one starting the next Monday meet at the rest gap
+        sunday = START + timedelta(days=6)
+        cooks = set(lock_keys([Role.COOK], START, sunday))
+        self.assertTrue(cooks & set(lock_keys([Role.COOK], sunday + timedelta(days=1), sunday + timedelta(days=7))))
+        self.assertFalse(cooks & set(lock_keys([Role.COOK], sunday + timedelta(days=9), sunday + timedelta(days=13))))
+        self.assertFalse(cooks & set(lock_keys([Role.CASHIER], START, sunday)))
+
+        self.assertTrue(set(employee_lock_keys([(1, START)])) & set(employee_lock_keys([(1, START + timedelta(days=1))])))
+        self.assertFalse(set(employee_lock_keys([(1, START)])) & set(employee_lock_keys([(2, START)])))
+
+    # Advisory locks are re-entrant within the one session a test runs in
+    @skipUnless(connection.vendor != 'postgresql', "needs a second session on PostgreSQL")
+    def test_locks_are_all_or_nothing(self):
+        with ScheduleLock(['a', 'b']):
+            with self.assertRaises(LockTimeout):
+                ScheduleLock(['b', 'c'], timeout=0).__enter__()
+            # The failed attempt took none of its keys
+            with ScheduleLock(['c'], timeout=0):
+                pass
+        with ScheduleLock(['a', 'b', 'c'], timeout=0):
+            pass
+
+    @skipUnless(connection.vendor != 'postgresql', "needs a second session on PostgreSQL")
+    def test_horizon_locks_conflict_only_on_shared_keys(self):
+        with horizon_lock([Role.COOK], START, START + timedelta(days=3)):
+            with self.assertRaises(LockTimeout):
+                horizon_lock([Role.COOK], START + timedelta(days=3), START + timedelta(days=5), timeout=0).__enter__()
+            with horizon_lock([Role.CASHIER], START, START + timedelta(days=3), timeout=0):
+                pass
+
+
+class SolverRulesTests(TestCase):
+    """The hard rules hold for the assignments every backend adds to a schedule."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_schedule(n_employees=30, days=21)
+
+    def assertHardRules(self, added):
+        self.assertTrue(added)
+        shifts = {shift.pk: shift for shift in Shift.objects.all()}
+        staff, worked = {}, {}
+        for employee_id, shift_id in Schedule.objects.values_list('employee_id', 'shift_id'):
+            staff.setdefault(shift_id, []).append(employee_id)
+            worked.setdefault(employee_id, []).append(shifts[shift_id])
+        employees = Employee.objects.in_bulk({employee_id for employee_id, _ in added})
+        roles = set(EmployeeRole.objects.values_list('employee_id', 'role'))
+
+        for employee_id, shift_id in added:
+            employee, shift = employees[employee_id], shifts[shift_id]
+            self.assertIn((employee_id, shift.role), roles)
+            self.assertTrue(employee.is_available(shift.date, shift.shift_time))
+            start, end = shift.get_shift_datetimes()
+            for other in worked[employee_id]:
+                other_start, other_end = other.get_shift_datetimes()
+                self.assertFalse(other != shift and other_start < end and start < other_end, (employee_id, shift_id, other.pk))
+            self.assertLessEqual(len(staff[shift_id]), get_required_staff(shift))
+            week = week_of(shift.date)
+            minutes = sum(SHIFT_TIMES[s.shift_time][1] for s in worked[employee_id] if week_of(s.date) == week)
+            self.assertLessEqual(minutes, employee.max_hours_per_week * 60)
+
+    def run_schedule(self, **options):
+        """The (employee_id, shift_id) assignments a create_schedule run added."""
+        before = set(Schedule.objects.values_list('employee_id', 'shift_id'))
+        create_schedule(START, START + timedelta(days=20), **options)
+        return set(Schedule.objects.values_list('employee_id', 'shift_id')) - before
+
+    def test_every_backend(self):
+        for solver in SOLVER_BACKENDS:
+            with self.subTest(solver=solver), transaction.atomic():
+                self.assertHardRules(self.run_schedule(solver=solver, workers=1, time_budget=0.5))
+                transaction.set_rollback(True)
+
+    def test_blocks_solved_in_parallel(self):
+        employees = list(Employee.objects.all())
+        model = build_cost_model(employees, list(Shift.objects.filter(date__gte=START)))
+        self.assertGreater(max(len(blocks) for blocks in decompose(model)), 1)
+        for solver in ('hungarian', 'sparse_matching'):
+            with self.subTest(solver=solver), transaction.atomic():
+                self.assertHardRules(self.run_schedule(solver=solver, workers=2))
+                transaction.set_rollback(True)
@@ -0,0 +1,64 @@
+from bisect import bisect_left, bisect_right, insort
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+class Timeline:
+    """
+    Shifts assigned to each employee during a scheduling run, built once from the
+    existing schedule and updated as the solver adds assignments.
+
+    Times are minutes from a Monday at midnight, so an overnight shift simply ends
+    past the next midnight. Each employee keeps the starts and the ends of their
+    shifts in two sorted lists, which answers overlap queries with two bisections.
+    Alongside, `last_end` holds the latest end of the shifts starting on each day
+    (for the rest-gap rule) and `week_minutes` the minutes worked in each week, as
+    employees x days and employees x weeks arrays that cost lookups can index in bulk.
+    """
+
+    def __init__(self, n_employees, n_days):
+        self.starts = [[] for _ in range(n_employees)]
+        self.ends = [[] for _ in range(n_employees)]
+        self.last_end = np.full((n_employees, n_days), -np.inf)
+        self.week_minutes = np.zeros((n_employees, -(-n_days // 7)))
+
+    def add(self, row, start, end):
+        insort(self.starts[row], start)
+        insort(self.ends[row], end)
+        day = start // MINUTES_PER_DAY
+        self.last_end[row, day] = max(self.last_end[row, day], end)
+        self.week_minutes[row, start // MINUTES_PER_WEEK] += end - start
+
+    def overlaps(self, row, start, end):
+        # Shifts starting before `end`, minus those already over by `start`
+        return bisect_left(self.starts[row], end) > bisect_right(self.ends[row], start)
+
+    def overlapping(self, row, starts, ends):
+        """Vectorized overlaps() of one employee against many intervals."""
+        started = np.searchsorted(self.starts[row], ends, side='left')
+        finished = np.searchsorted(self.ends[row], starts, side='right')
+        return started > finished
+
+    def next_start(self, row, end):
+        """Start of the employee's first shift starting at or after `end`, or inf."""
+        starts = self.starts[row]
+        index = bisect_left(starts, end)
+        return starts[index] if index < len(starts) else np.inf
+
+    def weekly_minutes(self, row, start):
+        return self.week_minutes[row, start // MINUTES_PER_WEEK]
+
+    def busy_rows(self):
+        return [row for row, starts in enumerate(self.starts) if starts]
+
+    def take(self, rows):
+        """Independent copy holding only the given employee rows, renumbered in order."""
+        timeline = Timeline(0, 0)
+        timeline.starts = [list(self.starts[row]) for row in rows]
+        timeline.ends = [list(self.ends[row]) for row in rows]
+        timeline.last_end = self.last_end[rows].copy()
+        timeline.week_minutes = self.week_minutes[rows].copy()
+        return timeline
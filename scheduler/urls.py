@@ -5,7 +5,14 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('dashboard/', views.dashboard, name='dashboard'),
     path('generate/', views.generate_schedule, name='generate_schedule'),
+    path('jobs/<int:job_id>/', views.job_status, name='job_status'),
+    path('shifts/<int:shift_id>/replacements/', views.shift_replacements, name='shift_replacements'),
     path('view/', views.view_schedule, name='view_schedule'),
+    path('api/schedule/', views.schedule_api, name='schedule_api'),
+    path('export/schedule.csv', views.export_schedule_csv, name='export_schedule_csv'),
+    path('export/employees/<int:employee_id>/schedule.ics', views.export_employee_ics, name='export_employee_ics'),
+    path('calendar/<slug:token>.ics', views.employee_calendar, name='employee_calendar'),
+    path('calendar/reset/', views.reset_calendar_token, name='reset_calendar_token'),
     path('results/', views.view_results, name='view_results'),
     path('preferences/', views.employee_preferences, name='employee_preferences'),
     path('generate-shifts/', views.generate_shifts, name='generate_shifts'),
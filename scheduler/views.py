@@ -1,19 +1,46 @@
-from django.shortcuts import render, redirect
-from django.http import JsonResponse
+import hashlib
+
+from django.shortcuts import render, redirect, get_object_or_404
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.urls import reverse
+from django.db.models import F
 from django.utils import timezone
-from .scheduling import create_schedule
-from .models import Employee, Shift, Schedule, SchedulingResult, EmployeeRole, Role, ShiftTime
-from .forms import EmployeePreferencesForm, ShiftGenerationForm
-from datetime import timedelta
+from django.views.decorators.http import condition, require_POST
+from .export import csv_lines, ics_lines
+from .jobs import enqueue_schedule, enqueue_reschedule
+from .ledger import week_of
+from .shifts import generate_shifts_for_period
+from .models import new_calendar_token, Employee, EmployeeWeekHours, Shift, Schedule, ScheduleVersion, SchedulingResult, SchedulingJob, SchedulingPhase
+from .forms import AvailabilityForm, EmployeePreferencesForm, ReplacementQueryForm, ScheduleCursorField, ScheduleFilterForm, ScheduleHorizonForm, ShiftGenerationForm
+
+SCHEDULE_PAGE_SIZE = 100
 
 def is_manager(user):
     return user.groups.filter(name='Managers').exists()
 
 @login_required
 def dashboard(request):
-    # Add your dashboard logic here
-    return render(request, 'scheduler/dashboard.html')
+    manager = is_manager(request.user)
+    this_week = week_of(timezone.now().date())
+    # Weekly totals come from the weekly-hours ledger, one query each
+    week_hours = EmployeeWeekHours.objects.filter(employee__user=request.user, week__gte=this_week).order_by('week')[:4]
+    over_hours = None
+    if manager:
+        over_hours = EmployeeWeekHours.objects.filter(
+            week=this_week,
+            minutes__gt=F('employee__max_hours_per_week') * 60
+        ).select_related('employee').order_by('-minutes')
+    employee = Employee.objects.filter(user=request.user).first()
+    calendar_url = employee and request.build_absolute_uri(reverse('employee_calendar', args=[employee.calendar_token]))
+    return render(request, 'scheduler/dashboard.html', {
+        'is_manager': manager,
+        'calendar_url': calendar_url,
+        'horizon_form': ScheduleHorizonForm(),
+        'week_hours': week_hours,
+        'over_hours': over_hours,
+    })
 
 @login_required
 def employee_preferences(request):
@@ -21,14 +48,23 @@ def employee_preferences(request):
     
     if request.method == 'POST':
         preferences_form = EmployeePreferencesForm(request.POST, instance=employee)
-        if preferences_form.is_valid():
-            preferences_form.save()
+        availability_form = AvailabilityForm(request.POST, prefix='availability')
+        preferred_form = AvailabilityForm(request.POST, prefix='preferred')
+        if preferences_form.is_valid() and availability_form.is_valid() and preferred_form.is_valid():
+            employee = preferences_form.save(commit=False)
+            employee.availability_mask = availability_form.to_mask()
+            employee.preference_mask = preferred_form.to_mask()
+            employee.save()
+            enqueue_reschedule(requested_by=request.user, employees=[employee])
             return redirect('dashboard')
     else:
         preferences_form = EmployeePreferencesForm(instance=employee)
+        availability_form = AvailabilityForm(prefix='availability', initial=AvailabilityForm.initial_from_mask(employee.availability_mask))
+        preferred_form = AvailabilityForm(prefix='preferred', initial=AvailabilityForm.initial_from_mask(employee.preference_mask))
     
     return render(request, 'scheduler/employee_preferences.html', {
         'preferences_form': preferences_form,
+        'weekly_forms': [('Availability', availability_form), ('Preferred Shifts', preferred_form)],
     })
 
 @user_passes_test(lambda u: u.is_staff)
@@ -45,38 +81,215 @@ def generate_shifts(request):
     
     return render(request, 'scheduler/generate_shifts.html', {'form': form})
 
-def generate_shifts_for_period(start_date, end_date):
-    current_date = start_date
-    while current_date <= end_date:
-        for role in Role.choices:
-            for shift_time in ShiftTime.choices:
-                Shift.objects.get_or_create(
-                    role=role[0],
-                    date=current_date,
-                    shift_time=shift_time[0]
-                )
-        current_date += timedelta(days=1)
-
 @login_required
 @user_passes_test(is_manager)
+@require_POST
 def generate_schedule(request):
-    total_satisfaction, unassigned_shifts = create_schedule()
+    form = ScheduleHorizonForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    # Scheduling runs on the worker started by `manage.py run_scheduler_worker`
+    start_date, end_date = form.cleaned_data['start_date'], form.cleaned_data['end_date']
+    job = enqueue_schedule(
+        requested_by=request.user,
+        start=start_date.isoformat() if start_date else None,
+        end=end_date.isoformat() if end_date else None,
+        roles=form.cleaned_data['roles'],
+        solver=form.cleaned_data['solver'] or None,
+        time_budget=form.cleaned_data['time_budget'],
+        warm_start=form.cleaned_data['warm_start'] or None
+    )
+    return JsonResponse({
+        'job_id': job.id,
+        'status_url': reverse('job_status', args=[job.id])
+    }, status=202)
+
+@login_required
+@user_passes_test(is_manager)
+def job_status(request, job_id):
+    job = get_object_or_404(SchedulingJob, pk=job_id)
+    return JsonResponse({
+        'job_id': job.id,
+        'status': job.status,
+        'phase': job.phase,
+        'progress': job.progress,
+        'result': job.result,
+        'error': job.error,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at
+    })
+
+@login_required
+@user_passes_test(is_manager)
+def shift_replacements(request, shift_id):
+    # The scheduling module loads NumPy, which most requests never need
+    from .scheduling import find_replacements
+
+    shift = get_object_or_404(Shift, pk=shift_id)
+    form = ReplacementQueryForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    replacements = find_replacements(
+        shift,
+        limit=form.cleaned_data['limit'] or 5,
+        exclude=form.cleaned_data['exclude']
+    )
     return JsonResponse({
-        'total_satisfaction': total_satisfaction,
-        'unassigned_shifts': unassigned_shifts
+        'shift': {
+            'id': shift.id,
+            'role': shift.role,
+            'date': shift.date,
+            'shift_time': shift.shift_time,
+            'start': shift.start_datetime,
+            'end': shift.end_datetime
+        },
+        'replacements': [
+            {
+                'employee_id': replacement['employee'].id,
+                'name': replacement['employee'].name,
+                'cost': replacement['cost'],
+                'rating': replacement['rating'],
+                'preferred': replacement['preferred'],
+                'short_rest': replacement['short_rest'],
+                'week_hours': replacement['week_hours']
+            }
+            for replacement in replacements
+        ]
     })
 
+def schedule_version(request):
+    # Shared by the ETag and Last-Modified checks, so the row is read once per request
+    if not hasattr(request, '_schedule_version'):
+        request._schedule_version = ScheduleVersion.objects.current()
+    return request._schedule_version
+
+def schedule_etag(request):
+    version, _ = schedule_version(request)
+    return hashlib.md5(f"{request.get_full_path()}:{version}".encode()).hexdigest()
+
+def schedule_last_modified(request):
+    _, updated_at = schedule_version(request)
+    return updated_at
+
+def schedule_page(request, form):
+    """
+    The page of assignments a valid ScheduleFilterForm asks for, continuing after its
+    `after` assignment, and the URL of the next page, or None on the last one.
+    """
+    schedules = form.filter(Schedule.objects.listing())
+    if form.cleaned_data['after']:
+        schedules = schedules.after(*form.cleaned_data['after'])
+    limit = form.cleaned_data['limit'] or SCHEDULE_PAGE_SIZE
+    # One row more than the page tells whether another page follows
+    page = list(schedules[:limit + 1])
+    if len(page) <= limit:
+        return page, None
+    page = page[:limit]
+    parameters = request.GET.copy()
+    parameters['after'] = ScheduleCursorField.encode(page[-1])
+    return page, f'{request.path}?{parameters.urlencode()}'
+
 @login_required
 @user_passes_test(is_manager)
+@condition(etag_func=schedule_etag, last_modified_func=schedule_last_modified)
 def view_schedule(request):
-    schedules = Schedule.objects.all().order_by('shift__date', 'shift__shift_time')
-    return render(request, 'scheduler/schedule.html', {'schedules': schedules})
+    form = ScheduleFilterForm(request.GET)
+    schedules, next_page = schedule_page(request, form) if form.is_valid() else ([], None)
+    return render(request, 'scheduler/schedule.html', {
+        'form': form,
+        'schedules': schedules,
+        'next_page': next_page,
+    })
+
+@login_required
+@user_passes_test(is_manager)
+@condition(etag_func=schedule_etag, last_modified_func=schedule_last_modified)
+def schedule_api(request):
+    form = ScheduleFilterForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    schedules, next_page = schedule_page(request, form)
+    return JsonResponse({
+        'schedules': [
+            {
+                'id': schedule.id,
+                'employee_id': schedule.employee_id,
+                'employee': schedule.employee.name,
+                'shift_id': schedule.shift_id,
+                'role': schedule.shift.role,
+                'date': schedule.shift.date,
+                'shift_time': schedule.shift.shift_time,
+                'start': schedule.shift.start_datetime,
+                'end': schedule.shift.end_datetime
+            }
+            for schedule in schedules
+        ],
+        'next': next_page
+    })
+
+@login_required
+@user_passes_test(is_manager)
+def export_schedule_csv(request):
+    form = ScheduleFilterForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    response = StreamingHttpResponse(csv_lines(form.filter(Schedule.objects.all())), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="schedule.csv"'
+    return response
+
+@login_required
+def export_employee_ics(request, employee_id):
+    employee = get_object_or_404(Employee, pk=employee_id)
+    # Employees can subscribe to their own shifts, managers to anyone's
+    if employee.user_id != request.user.pk and not is_manager(request.user):
+        raise PermissionDenied
+
+    return employee_ics(request, employee)
+
+def employee_calendar(request, token):
+    # No login: calendar apps subscribe with the employee's secret token in the URL
+    employee = get_object_or_404(Employee, calendar_token=token)
+    return employee_ics(request, employee)
+
+@login_required
+@require_POST
+def reset_calendar_token(request):
+    employee = get_object_or_404(Employee, user=request.user)
+    employee.calendar_token = new_calendar_token()
+    employee.save(update_fields=['calendar_token'])
+    return redirect('dashboard')
+
+def employee_ics(request, employee):
+    schedules = Schedule.objects.filter(employee=employee)
+    response = StreamingHttpResponse(ics_lines(schedules, f'{employee.name} shifts', request.get_host()), content_type='text/calendar')
+    response['Content-Disposition'] = f'attachment; filename="schedule-{employee.pk}.ics"'
+    return response
 
 @login_required
 @user_passes_test(is_manager)
 def view_results(request):
     results = SchedulingResult.objects.all().order_by('-created_at')
-    return render(request, 'scheduler/results.html', {'results': results})
+    # Oldest first, for the charts of how runs scale over time
+    trend = [
+        {
+            'created_at': result.created_at.isoformat(),
+            'feasible_pairs': result.feasible_pairs,
+            'objective': result.objective,
+            'queries': result.query_count,
+            'phases': {phase: result.phase_seconds(phase) for phase in SchedulingPhase.values},
+        }
+        for result in reversed(results[:100])
+    ]
+    return render(request, 'scheduler/results.html', {
+        'results': results,
+        'trend': trend,
+        'phases': SchedulingPhase.choices,
+    })
 
 def home(request):
     return render(request, 'scheduler/home.html')
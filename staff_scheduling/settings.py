@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "scheduler.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -139,3 +140,43 @@ LOGIN_REDIRECT_URL = '/scheduler/dashboard/'
 LOGOUT_REDIRECT_URL = '/accounts/login/'
 LOGIN_URL = '/admin/login/'
 LOGIN_REDIRECT_URL = '/scheduler/'
+
+# Solver backend used by scheduling runs: 'auto' picks one from the size and
+# density of the problem; see scheduler/solvers.py for the others
+SCHEDULER_SOLVER = 'auto'
+
+# Query and timing instrumentation of requests and scheduling phases; the
+# thresholds flag likely N+1 queries and RAISE_ON_THRESHOLD turns them into errors
+SCHEDULER_INSTRUMENTATION = {
+    'SERVER_TIMING': DEBUG,
+    'MAX_QUERIES': 100,
+    'MAX_DUPLICATE_QUERIES': 20,
+    'RAISE_ON_THRESHOLD': False,
+}
+
+# Employee feature vectors and shift descriptors read by scheduling runs. Entries are
+# checked against the employee rows and the version counters each run loads, so a
+# cache per process is safe; pointing this at a cache the web and worker processes
+# share (Redis, Memcached) only saves rebuilding
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'scheduler': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'scheduler',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+SCHEDULER_CACHE = 'scheduler'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'scheduler': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}